@@ -18,6 +18,10 @@ def create_app(config_class=Config):
     CORS(app, resources={r"/api/*": {
         "origins": ["https://www.lingosummar.com", "https://lingosummar.netlify.app", "https://lingosummar.com"]}})
 
+    # Count the database commands of every request; the listener must exist before the client
+    from app.utils.query_counter import init_query_counter
+    init_query_counter(app)
+
     # Initialize MongoDB with Flask
     db.init_app(app)
 
@@ -28,6 +32,37 @@ def create_app(config_class=Config):
         except Exception as e:
             app.logger.error(f"Could not connect to MongoDB: {e}")
 
+    # Configure the process-wide NLP pipeline and load it before the first request
+    from app.summarizer.pipeline import registry
+    registry.configure(app.config['SPACY_MODEL'], app.config['SPACY_EXCLUDE'], app.config['SYNONYM_INDEX_PATH'])
+    if app.config['NLP_WARMUP']:
+        try:
+            stats = registry.warm().stats()
+            app.logger.info(f"Loaded NLP pipeline {stats['model']} in {stats['load_seconds']}s, "
+                            f"resident memory {stats['rss_after_bytes']} bytes")
+        except Exception as e:
+            app.logger.error(f"Could not load NLP pipeline: {e}")
+
+    # Create the summary cache and drop persistent entries made with a previous configuration
+    from app.cache.cache import init_summary_cache
+    cache = init_summary_cache(app)
+    if app.config['NLP_WARMUP']:
+        with app.app_context():
+            try:
+                purged = cache.purge_stale()
+                if purged:
+                    app.logger.info(f"Purged {purged} stale cached summaries")
+            except Exception as e:
+                app.logger.error(f"Could not purge the summary cache: {e}")
+
+    # Create the bounded pool running queued summarization jobs
+    from app.jobs.jobs import init_job_queue
+    init_job_queue(app)
+
+    # Stream uploaded files into bounded in-memory buffers
+    from app.utils.ingestion import init_ingestion
+    init_ingestion(app)
+
     # Import and register the blueprint for API routes
     from app.routes.routes import bp as routes_bp
     app.register_blueprint(routes_bp)
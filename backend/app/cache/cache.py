@@ -0,0 +1,377 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from app.models.models import CachedSummary
+from app.summarizer.pipeline import get_pipeline
+from app.summarizer.rules import rule_base
+from app.summarizer.text_summarizer import TextSummarizer
+from app.summarizer.utils.helpers import mem_funcs, output_funcs
+
+# Bump whenever a change to the summarizer code changes its output for the same configuration
+CACHE_VERSION = 3
+
+
+def normalize_content(text):
+    """
+    Normalizes a text before it is hashed and summarized, so equal texts share one cache entry.
+
+    Line endings are unified and surrounding whitespace is removed. The summary is always computed
+    from the normalized text, so a cached summary is exactly what a fresh run would return.
+
+    Args:
+        text (str): The text to normalize.
+
+    Returns:
+        str: The normalized text.
+    """
+    return text.replace('\r\n', '\n').replace('\r', '\n').strip()
+
+
+def algorithm_fingerprint(pipeline):
+    """
+    Returns a hash of everything besides the request that determines a summary.
+
+    It covers the membership functions, the output functions, the rule base, the resource sets, the
+    synonym index and the spaCy model, so editing any of them makes every existing cache entry unreachable.
+
+    Args:
+        pipeline (NLPPipeline): The pipeline the summaries are computed with.
+
+    Returns:
+        str: The fingerprint.
+    """
+    synonyms = pipeline.synonyms.digest if pipeline.synonyms is not None else None
+    configuration = repr((CACHE_VERSION, mem_funcs, output_funcs, rule_base, pipeline.model_name,
+                          pipeline.exclude, pipeline.resources_digest, synonyms))
+    return hashlib.sha256(configuration.encode('utf-8')).hexdigest()
+
+
+def cache_key(content, percentage, options, fingerprint):
+    """
+    Returns the cache key of a summary.
+
+    Args:
+        content (str): The normalized text.
+        percentage (float): The compression rate as a percentage.
+        options (dict): The TextSummarizer arguments; the seed, clustering mode, defuzzifier and section length
+            are part of the key.
+        fingerprint (str): The algorithm fingerprint.
+
+    Returns:
+        str: The key.
+    """
+    digest = hashlib.sha256(content.encode('utf-8'))
+    digest.update(repr((float(percentage), options.get('seed'), options.get('clustering_mode', 'medoids'),
+                        options.get('defuzzifier', 'sampled'), options.get('section_chars'),
+                        fingerprint)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def content_key(content, fingerprint):
+    """
+    Returns the key of the rate independent analysis of a normalized text.
+    """
+    digest = hashlib.sha256(content.encode('utf-8'))
+    digest.update(fingerprint.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class LRUCache:
+    """
+    Thread-safe dictionary evicting its least recently used entries beyond max_entries.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SummaryCache:
+    """
+    Content-addressed cache of summaries.
+
+    Lookups go through an in-memory LRU tier of this process first and then through the CachedSummary
+    collection shared by every worker. Entries are keyed by the text, the compression rate, the options
+    and the algorithm fingerprint, so they never need to be updated, only evicted.
+
+    On a miss, the parsed sentences, their features and their similarity matrix are kept in a smaller
+    LRU keyed by the text alone, so summarizing the same text at another percentage only reruns the
+    clustering and the selection of the ranked sentences.
+    """
+
+    def __init__(self, max_entries=1024, persistent=True, max_analyses=32):
+        self.max_entries = max_entries
+        self.persistent = persistent
+        self._entries = LRUCache(max_entries)
+        self.analyses = LRUCache(max_analyses)
+        self._fingerprint = None
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.analysis_hits = 0
+        self.analysis_misses = 0
+
+    def fingerprint(self, pipeline):
+        """
+        Returns the algorithm fingerprint and drops the memory tiers if it changed since the last call.
+        """
+        fingerprint = algorithm_fingerprint(pipeline)
+        if fingerprint != self._fingerprint:
+            with self._lock:
+                self._entries.clear()
+                self.analyses.clear()
+                self._fingerprint = fingerprint
+        return fingerprint
+
+    def get(self, key):
+        """
+        Returns a cached summary.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            str or None: The summary, or None on a miss.
+        """
+        summary = self._entries.get(key)
+        if summary is not None:
+            with self._lock:
+                self.memory_hits += 1
+            return summary
+
+        if self.persistent:
+            try:
+                cached = CachedSummary.objects(key=key).only('content').first()
+            except Exception:
+                cached = None
+                with self._lock:
+                    self.errors += 1
+            if cached is not None:
+                # The hit counter is best-effort, the summary is served even if it cannot be updated
+                try:
+                    CachedSummary.objects(key=key).update_one(inc__hits=1)
+                except Exception:
+                    with self._lock:
+                        self.errors += 1
+                self._entries.put(key, cached.content)
+                with self._lock:
+                    self.persistent_hits += 1
+                return cached.content
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, fingerprint, summary):
+        """
+        Stores a summary in both tiers.
+
+        Args:
+            key (str): The cache key.
+            fingerprint (str): The algorithm fingerprint, kept to purge stale entries.
+            summary (str): The summary.
+        """
+        self._entries.put(key, summary)
+        if self.persistent:
+            try:
+                CachedSummary.objects(key=key).update_one(upsert=True, set_on_insert__fingerprint=fingerprint,
+                                                          set_on_insert__content=summary,
+                                                          set_on_insert__words=len(summary.split()))
+            except Exception:
+                with self._lock:
+                    self.errors += 1
+
+    def summarize(self, content, percentage, options):
+        """
+        Returns the summary of a text, computing and caching it on a miss.
+
+        Args:
+            content (str): The text to summarize.
+            percentage (float): The compression rate as a percentage.
+            options (dict): Further TextSummarizer arguments.
+
+        Returns:
+            str: The summary.
+        """
+        pipeline = options.get('pipeline') or get_pipeline()
+        fingerprint = self.fingerprint(pipeline)
+        content = normalize_content(content)
+        key = cache_key(content, percentage, options, fingerprint)
+
+        summary = self.get(key)
+        if summary is None:
+            analysis_key = content_key(content, fingerprint)
+            analysis = self.analyses.get(analysis_key)
+            with self._lock:
+                if analysis is None:
+                    self.analysis_misses += 1
+                else:
+                    self.analysis_hits += 1
+
+            summarizer = TextSummarizer(content, percentage, analysis=analysis, **options)
+            summary = summarizer.summarize()
+            self.put(key, fingerprint, summary)
+            if analysis is None and summarizer.analysis is not None:
+                self.analyses.put(analysis_key, summarizer.analysis)
+        return summary
+
+    def summarize_rates(self, content, percentages, options):
+        """
+        Returns the summaries of a text at several compression rates, computing the missing ones in one pass.
+
+        Args:
+            content (str): The text to summarize.
+            percentages (list): The compression rates as percentages.
+            options (dict): Further TextSummarizer arguments.
+
+        Returns:
+            dict: The summary of every percentage.
+        """
+        pipeline = options.get('pipeline') or get_pipeline()
+        fingerprint = self.fingerprint(pipeline)
+        content = normalize_content(content)
+        keys = {percentage: cache_key(content, percentage, options, fingerprint) for percentage in percentages}
+
+        summaries = {}
+        for percentage, key in keys.items():
+            summary = self.get(key)
+            if summary is not None:
+                summaries[percentage] = summary
+        missing = [percentage for percentage in keys if percentage not in summaries]
+        if missing:
+            analysis_key = content_key(content, fingerprint)
+            analysis = self.analyses.get(analysis_key)
+            with self._lock:
+                if analysis is None:
+                    self.analysis_misses += 1
+                else:
+                    self.analysis_hits += 1
+
+            summarizer = TextSummarizer(content, missing[0], analysis=analysis, **options)
+            for percentage, summary in summarizer.summarize(rates=missing).items():
+                self.put(keys[percentage], fingerprint, summary)
+                summaries[percentage] = summary
+            if analysis is None and summarizer.analysis is not None:
+                self.analyses.put(analysis_key, summarizer.analysis)
+        return summaries
+
+    def summarize_many(self, texts, percentage, options, batch_size=64, n_process=1):
+        """
+        Summarizes many texts like TextSummarizer.summarize_many, parsing only the ones not cached.
+
+        Returns:
+            list: One dictionary per text, in input order, holding either the 'summary' or the 'error'.
+        """
+        pipeline = options.get('pipeline') or get_pipeline()
+        fingerprint = self.fingerprint(pipeline)
+        results = [None] * len(texts)
+
+        missing, keys = [], {}
+        for i, text in enumerate(texts):
+            if isinstance(text, str) and text.strip():
+                content = normalize_content(text)
+                keys[i] = cache_key(content, percentage, options, fingerprint)
+                summary = self.get(keys[i])
+                if summary is not None:
+                    results[i] = {'summary': summary, 'error': None}
+                    continue
+                text = content
+            missing.append((i, text))
+
+        computed = TextSummarizer.summarize_many([text for _, text in missing], percentage,
+                                                 batch_size=batch_size, n_process=n_process, **options)
+        for (i, _), result in zip(missing, computed):
+            if result['error'] is None:
+                self.put(keys[i], fingerprint, result['summary'])
+            results[i] = result
+        return results
+
+    def purge_stale(self, pipeline=None):
+        """
+        Deletes the persistent entries computed with another algorithm configuration.
+
+        Args:
+            pipeline (NLPPipeline, optional): The pipeline whose fingerprint is current. Defaults to the shared one.
+
+        Returns:
+            int: The number of deleted entries.
+        """
+        fingerprint = self.fingerprint(pipeline or get_pipeline())
+        if not self.persistent:
+            return 0
+        return CachedSummary.objects(fingerprint__ne=fingerprint).delete()
+
+    def clear(self):
+        """
+        Empties every tier.
+        """
+        self._entries.clear()
+        self.analyses.clear()
+        if self.persistent:
+            CachedSummary.objects.delete()
+
+    def stats(self):
+        """
+        Returns the hit and miss counters of this process.
+
+        Returns:
+            dict: The counters, the hit rate and the number of entries in the memory tier.
+        """
+        lookups = self.memory_hits + self.persistent_hits + self.misses
+        return {
+            'memory_hits': self.memory_hits,
+            'persistent_hits': self.persistent_hits,
+            'misses': self.misses,
+            'errors': self.errors,
+            'hit_rate': (self.memory_hits + self.persistent_hits) / lookups if lookups else None,
+            'memory_entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'analysis_hits': self.analysis_hits,
+            'analysis_misses': self.analysis_misses,
+            'analysis_entries': len(self.analyses),
+            'persistent': self.persistent,
+            'fingerprint': self._fingerprint,
+        }
+
+
+def init_summary_cache(app):
+    """
+    Creates the summary cache configured by SUMMARY_CACHE_SIZE, SUMMARY_CACHE_PERSISTENT and ANALYSIS_CACHE_SIZE.
+
+    Args:
+        app (Flask): The application the cache is registered on, as app.extensions['summary_cache'].
+
+    Returns:
+        SummaryCache: The cache.
+    """
+    cache = SummaryCache(app.config['SUMMARY_CACHE_SIZE'], app.config['SUMMARY_CACHE_PERSISTENT'],
+                         app.config['ANALYSIS_CACHE_SIZE'])
+    app.extensions['summary_cache'] = cache
+    return cache
@@ -0,0 +1,132 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app.models.models import Summary, Text
+
+
+class JobQueueFull(Exception):
+    """
+    Raised when a job is submitted while the queue already holds its maximum number of jobs.
+    """
+
+
+class JobQueue:
+    """
+    Bounded pool of local worker threads running summarization jobs off the request thread.
+
+    At most max_depth jobs may be queued or running at once; submitting more raises JobQueueFull
+    so the caller can answer with 429 instead of piling up work.
+    """
+
+    def __init__(self, workers=2, max_depth=32):
+        self.workers = workers
+        self.max_depth = max_depth
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='summary-job')
+        self._depth = 0
+        self._lock = threading.Lock()
+
+    @property
+    def depth(self):
+        return self._depth
+
+    def is_full(self):
+        return self._depth >= self.max_depth
+
+    def submit(self, fn, *args):
+        """
+        Queues fn(*args) for a worker thread.
+
+        Raises:
+            JobQueueFull: If max_depth jobs are already queued or running.
+        """
+        with self._lock:
+            if self._depth >= self.max_depth:
+                raise JobQueueFull()
+            self._depth += 1
+        try:
+            return self._pool.submit(self._run, fn, args)
+        except Exception:
+            self._release()
+            raise
+
+    def _run(self, fn, args):
+        try:
+            return fn(*args)
+        finally:
+            self._release()
+
+    def _release(self):
+        with self._lock:
+            self._depth -= 1
+
+
+class InlineJobQueue(JobQueue):
+    """
+    Job queue running every job immediately in the submitting thread, for tests and debugging.
+    """
+
+    def __init__(self, workers=1, max_depth=32):
+        self.workers = workers
+        self.max_depth = max_depth
+        self._depth = 0
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args):
+        with self._lock:
+            if self._depth >= self.max_depth:
+                raise JobQueueFull()
+            self._depth += 1
+        return self._run(fn, args)
+
+
+JOB_QUEUES = {
+    'thread': JobQueue,
+    'inline': InlineJobQueue,
+}
+
+
+def init_job_queue(app):
+    """
+    Creates the job queue configured by JOB_QUEUE_BACKEND, JOB_WORKERS and JOB_QUEUE_MAX_DEPTH.
+
+    Args:
+        app (Flask): The application the queue is registered on, as app.extensions['job_queue'].
+
+    Returns:
+        JobQueue: The queue.
+    """
+    queue = JOB_QUEUES[app.config['JOB_QUEUE_BACKEND']](app.config['JOB_WORKERS'], app.config['JOB_QUEUE_MAX_DEPTH'])
+    app.extensions['job_queue'] = queue
+    return queue
+
+
+def run_summary_job(app, summary_id, content, percentage, options):
+    """
+    Summarizes a text and stores the result in its pending Summary document.
+
+    Args:
+        app (Flask): The application, whose context the job runs in.
+        summary_id: The ID of the pending Summary document.
+        content (str): The text to summarize.
+        percentage (float): The compression rate as a percentage.
+        options (dict): Further TextSummarizer arguments.
+    """
+    with app.app_context():
+        summary = Summary.objects(id=summary_id).first()
+        if summary is None:
+            return
+        summary.update(set__status=Summary.RUNNING)
+
+        def report_progress(level, done, total):
+            summary.update(set__progress={'level': level, 'sections_done': done, 'sections_total': total})
+
+        try:
+            result = app.extensions['summary_cache'].summarize(content, percentage,
+                                                               dict(options, progress=report_progress))
+        except Exception as e:
+            app.logger.exception(f"Summary job {summary_id} failed")
+            summary.update(set__status=Summary.FAILED, set__error=str(e))
+            return
+        summary.update(set__content=result, set__words=len(result.split()), set__status=Summary.DONE)
+        # Only the summary list of the text is updated; its content is not loaded
+        Text.push_summary(summary.to_mongo().get('text'), summary)
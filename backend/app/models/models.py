@@ -4,14 +4,22 @@ from app import db
 
 
 class Summary(db.Document):
-    content = db.StringField(required=True)
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    content = db.StringField(required=True)  # Empty until a queued summary is done
     percentage = db.FloatField()  # The percentage of the text that the summary covers
     words = db.IntField()  # Number of words in the summary
     created_at = db.DateTimeField(default=datetime.utcnow)
     text = db.ReferenceField('Text')  # Reference to the Text document
+    status = db.StringField(default=DONE, choices=(PENDING, RUNNING, DONE, FAILED))  # State of a queued summary
+    error = db.StringField()  # Why a queued summary failed
+    progress = db.DictField()  # Sections done so far while a long text is summarized section by section
 
     @classmethod
-    def create_summary(cls, content, percentage, words, text):
+    def create_summary(cls, content, percentage, words, text, status=DONE):
         """
         Create and save a new Summary document.
 
@@ -19,12 +27,36 @@ class Summary(db.Document):
         :param percentage: The percentage of the original text covered.
         :param words: The word count of the summary.
         :param text: The Text document this summary is associated with.
+        :param status: The state of the summary, pending for summaries computed by a background job.
         :return: The created Summary document.
         """
-        summary = cls(content=content, percentage=percentage, words=words, text=text)
+        summary = cls(content=content, percentage=percentage, words=words, text=text, status=status)
         summary.save()
         return summary
 
+    @classmethod
+    def get_summaries(cls, summary_ids):
+        """
+        Fetch many summaries with one query, in the order of their IDs.
+
+        :param summary_ids: The IDs of the Summary documents to fetch.
+        :return: The Summary documents found; IDs of deleted summaries are skipped.
+        """
+        summary_ids = list(summary_ids)
+        summaries = {summary.id: summary for summary in cls.objects(id__in=summary_ids).no_dereference()}
+        return [summaries[summary_id] for summary_id in summary_ids if summary_id in summaries]
+
+    @classmethod
+    def get_raw_summaries(cls, summary_ids):
+        """
+        Fetch many summaries in one query, as raw documents holding only the fields the listings return.
+
+        :param summary_ids: The IDs of the Summary documents to fetch.
+        :return: A dictionary mapping each found ID to its raw document.
+        """
+        summaries = cls.objects(id__in=list(summary_ids)).only('content', 'created_at', 'percentage', 'words')
+        return {summary['_id']: summary for summary in summaries.as_pymongo()}
+
 
 class Text(db.Document):
     content = db.StringField(required=True)
@@ -53,11 +85,25 @@ class Text(db.Document):
         """
         Add a Summary document to the Text document's list of summaries.
 
+        The summary is appended with an atomic $push, so concurrent calls never lose each other's summaries
+        and the rest of the document is not written again. The summaries already loaded on this instance
+        are left as they are; reload the text to see the new one.
+
         :param summary: The Summary document to add.
         :return: The created Summary document.
         """
-        self.summaries.append(summary)
-        self.save()
+        return self.push_summary(self.id, summary)
+
+    @classmethod
+    def push_summary(cls, text_id, summary):
+        """
+        Append a Summary document to the list of summaries of a text without loading the text.
+
+        :param text_id: The ID of the Text document.
+        :param summary: The Summary document to add.
+        :return: The added Summary document.
+        """
+        cls.objects(id=text_id).update_one(push__summaries=summary)
         return summary
 
     @classmethod
@@ -65,12 +111,15 @@ class Text(db.Document):
         """
         Fetch a Text document by its ID, including all related Summary documents.
 
+        The text is loaded without resolving its summary references, which are then fetched together
+        with a single $in query instead of one query each.
+
         :param text_id: The ID of the Text document to fetch.
         :return: The Text document along with its Summary documents if found, None otherwise.
         """
-        text = cls.objects(id=text_id).first()
+        text = cls.objects(id=text_id).no_dereference().first()
         if text:
-            text.summaries = [summary for summary in Summary.objects(text=text)]
+            text.summaries = Summary.get_summaries(reference.id for reference in text.summaries)
         return text
 
     @classmethod
@@ -92,3 +141,43 @@ class Text(db.Document):
         :return: The Text document if found, None otherwise.
         """
         return cls.objects(id=text_id).first()
+
+    @classmethod
+    def get_page(cls, after=None, limit=None):
+        """
+        Fetch the texts following a cursor, in ID order.
+
+        :param after: The ID of the last text of the previous page, or None to start from the first text.
+        :param limit: The maximum number of texts, or None for every remaining text.
+        :return: The QuerySet of the texts.
+        """
+        texts = cls.objects(id__gt=after) if after is not None else cls.objects
+        texts = texts.order_by('id')
+        return texts.limit(limit) if limit else texts
+
+    @classmethod
+    def get_previews(cls, length, after=None, limit=None):
+        """
+        Fetch the IDs and beginnings of the texts following a cursor, cut by the database so the full
+        contents are never transferred.
+
+        :param length: The length of the previews.
+        :param after: The ID of the last text of the previous page, or None to start from the first text.
+        :param limit: The maximum number of texts, or None for every remaining text.
+        :return: A cursor over raw documents with the '_id' and the 'preview' holding the first length + 1
+            characters, so that texts longer than the preview can be told apart.
+        """
+        return cls.get_page(after, limit).aggregate([
+            {'$project': {'preview': {'$substrCP': ['$content', 0, length + 1]}}}
+        ])
+
+
+class CachedSummary(db.Document):
+    key = db.StringField(required=True, unique=True)  # Hash of the content, rate, options and fingerprint
+    fingerprint = db.StringField(required=True)  # Hash of the algorithm configuration that produced the summary
+    content = db.StringField(default='')
+    words = db.IntField()
+    hits = db.IntField(default=0)
+    created_at = db.DateTimeField(default=datetime.utcnow)
+
+    meta = {'indexes': ['fingerprint']}
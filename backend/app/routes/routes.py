@@ -1,9 +1,13 @@
-import os
-import sys
+import time
 
+from app.jobs.jobs import JobQueueFull, run_summary_job
 from app.models.models import Text, Summary
-from app.summarizer.text_summarizer import TextSummarizer
-from app.utils.helpers import allowed_file, read_text_from_file, get_or_generate_percentage
+from app.summarizer.executors import get_executor
+from app.summarizer.pipeline import registry
+from app.utils.helpers import PAGE_BREAK, allowed_file, get_or_generate_percentage
+from app.utils.ingestion import IngestionError, TooManyPages, UploadTooLarge, read_upload
+from app.utils.streaming import parse_page_args, stream_items
+from bson import ObjectId
 from flask import Blueprint, request, jsonify, current_app
 from flask_cors import cross_origin
 from werkzeug.utils import secure_filename
@@ -11,6 +15,191 @@ from werkzeug.utils import secure_filename
 bp = Blueprint('routes', __name__, url_prefix='/api/v1')
 
 
+def summarizer_options(seed=None):
+    """
+    Returns the TextSummarizer arguments configured for this worker.
+
+    Args:
+        seed (int, optional): The clustering seed sent with the request. Defaults to the configured seed.
+
+    Returns:
+        dict: The keyword arguments for TextSummarizer.
+    """
+    config = current_app.config
+    return {
+        'executor': get_executor(config['SIMILARITY_EXECUTOR'], config['SIMILARITY_WORKERS']),
+        'seed': seed if seed is not None else config['CLUSTERING_SEED'],
+        'clustering_mode': config['CLUSTERING_MODE'],
+        'defuzzifier': config['DEFUZZIFIER'],
+        'section_chars': config['SECTION_CHARS'],
+        'section_workers': config['SECTION_WORKERS'],
+    }
+
+
+def parse_seed(value):
+    """
+    Reads the clustering seed sent with a request.
+
+    Args:
+        value: The seed as sent in the JSON body or the form, or None.
+
+    Returns:
+        int or None: The seed, or None when the request has none.
+
+    Raises:
+        ValueError: If the seed is not a non-negative integer.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (bool, float)):
+        raise ValueError("The seed must be a non-negative integer")
+    try:
+        seed = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("The seed must be a non-negative integer")
+    if seed < 0:
+        raise ValueError("The seed must be a non-negative integer")
+    return seed
+
+
+def summarize_content(content, percentage, seed=None):
+    """
+    Summarizes a text with the options configured for this worker, going through the summary cache.
+
+    Args:
+        content (str): The text to summarize.
+        percentage (float): The compression rate as a percentage.
+        seed (int, optional): The clustering seed sent with the request. Defaults to the configured seed.
+
+    Returns:
+        str: The summary.
+    """
+    return current_app.extensions['summary_cache'].summarize(content, percentage, summarizer_options(seed))
+
+
+def wants_async():
+    """
+    Returns whether the client asked for the summary to be computed by a background job.
+
+    Returns:
+        bool: True if the request has the query parameter async=true.
+    """
+    return request.args.get('async', '').lower() in ('1', 'true')
+
+
+def job_queue_full():
+    """
+    Returns whether the background job queue refuses new jobs.
+
+    Returns:
+        bool: True if the queue holds its maximum number of jobs.
+    """
+    return current_app.extensions['job_queue'].is_full()
+
+
+def enqueue_summary(text, percentage, seed=None, new_text=False, content=None):
+    """
+    Creates a pending Summary for a text and queues the job computing it.
+
+    Args:
+        text (Text): The Text document to summarize.
+        percentage (float): The compression rate as a percentage.
+        seed (int, optional): The clustering seed sent with the request.
+        new_text (bool): Whether the text was created by this request, so it is deleted as well when the
+            job cannot be queued.
+        content (str, optional): The text handed to the summarizer, e.g. an upload with its page breaks.
+            Defaults to the content of the Text document.
+
+    Returns:
+        tuple: A 202 JSON response with the job id, or a 429 response if the queue is full.
+    """
+    summary = Summary.create_summary(content='', percentage=percentage, words=0, text=text, status=Summary.PENDING)
+    try:
+        current_app.extensions['job_queue'].submit(run_summary_job, current_app._get_current_object(), summary.id,
+                                                   content if content is not None else text.content, percentage,
+                                                   summarizer_options(seed))
+    except JobQueueFull:
+        summary.delete()
+        if new_text:
+            text.delete()
+        return jsonify({"error": "Too many summaries in progress, try again later"}), 429
+    return jsonify({
+        "message": "Summary queued",
+        "id": str(text.id),
+        "job_id": str(summary.id)
+    }), 202
+
+
+def page_args():
+    """
+    Returns the cursor, page size and output format requested for a listing.
+
+    Returns:
+        tuple: The cursor, the limit or None for an unpaginated listing, and whether to send NDJSON.
+
+    Raises:
+        ValueError: If a parameter is invalid.
+    """
+    return parse_page_args(request.args, request.accept_mimetypes, current_app.config['MAX_PAGE_SIZE'])
+
+
+def preview(content, length):
+    """
+    Returns the first length characters of a text, followed by an ellipsis if it is longer.
+    """
+    return content[:length] + '...' if len(content) > length else content
+
+
+def summary_data(summary):
+    """
+    Returns the JSON representation of a raw Summary document.
+    """
+    return {
+        'id': str(summary['_id']),
+        'text': summary.get('content'),
+        'created_at': summary['created_at'].isoformat() if summary.get('created_at') else None,
+        'percentage': summary.get('percentage'),
+        'words': summary.get('words')
+    }
+
+
+def iter_texts_with_summaries(texts, batch_size):
+    """
+    Yields the JSON representation of raw Text documents with their summaries.
+
+    The summaries of batch_size texts at a time are fetched with a single query, in the order of the
+    text's summary list; references to deleted summaries are skipped.
+
+    Args:
+        texts (iterable): The raw Text documents.
+        batch_size (int): The number of texts whose summaries are fetched together.
+
+    Yields:
+        dict: The text and its summaries.
+    """
+    batch = []
+    for text in texts:
+        batch.append(text)
+        if len(batch) == batch_size:
+            yield from texts_with_summaries(batch)
+            batch = []
+    if batch:
+        yield from texts_with_summaries(batch)
+
+
+def texts_with_summaries(texts):
+    summaries = Summary.get_raw_summaries(summary_id for text in texts for summary_id in text.get('summaries', []))
+    for text in texts:
+        yield {
+            'id': str(text['_id']),
+            'text': text.get('content'),
+            'user_uid': text.get('user_uid'),
+            'created_at': text['created_at'].isoformat() if text.get('created_at') else None,
+            'summaries': [summary_data(summaries[summary_id]) for summary_id in text.get('summaries', [])
+                          if summary_id in summaries]
+        }
+
+
 @bp.route('/', methods=['GET'])
 @bp.route('/home', methods=['GET'])
 @cross_origin()
@@ -24,24 +213,53 @@ def home():
     return jsonify({"message": "Server is running"})
 
 
+@bp.route('/pipeline/stats', methods=['GET'])
+@cross_origin()
+def pipeline_stats():
+    """
+    Endpoint to report the NLP pipelines loaded by this worker process.
+
+    Returns:
+        JSON response containing the load time and resident memory of each loaded pipeline.
+    """
+    return jsonify({"pipelines": registry.stats()})
+
+
+@bp.route('/cache/stats', methods=['GET'])
+@cross_origin()
+def cache_stats():
+    """
+    Endpoint to report the summary cache hits and misses of this worker process.
+
+    Returns:
+        JSON response containing the cache counters.
+    """
+    return jsonify(current_app.extensions['summary_cache'].stats())
+
+
 @bp.route('/texts', methods=['GET'])
 @cross_origin()
 def get_all_texts():
     """
     Endpoint to retrieve all texts.
 
+    Query parameters:
+        cursor (str, optional): The next_cursor of the previous page.
+        limit (int, optional): The page size; paginates the listing.
+        format (str, optional): 'ndjson' to stream one text per line.
+
     Returns:
-        JSON response containing a list of all texts with first 20 characters.
+        Streamed JSON response containing a list of all texts with first 20 characters, or a page of them.
     """
-    texts = Text.objects.all()
-    texts_data = [
-        {
-            'id': str(text.id),
-            'text': text.content[:20] + '...' if len(text.content) > 20 else text.content,
-        }
-        for text in texts
-    ]
-    return jsonify(texts_data)
+    try:
+        after, limit, ndjson = page_args()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Only the first characters of every text are read from the database
+    texts_data = ({'id': str(text['_id']), 'text': preview(text.get('preview', ''), 20)}
+                  for text in Text.get_previews(20, after, limit))
+    return stream_items(texts_data, limit, ndjson)
 
 
 @bp.route('/text/summary/<text_id>', methods=['GET'])
@@ -56,7 +274,7 @@ def get_text_by_id(text_id):
     Returns:
         JSON response containing the text with the specified ID.
     """
-    text = Text.get_text_by_id(text_id)
+    text = Text.get_text_with_summaries(text_id)
     if text:
         return jsonify({
             'id': str(text.id),
@@ -119,31 +337,23 @@ def get_texts_summaries():
     """
     Endpoint to retrieve all texts along with their summaries.
 
+    Query parameters:
+        cursor (str, optional): The next_cursor of the previous page.
+        limit (int, optional): The page size; paginates the listing.
+        format (str, optional): 'ndjson' to stream one text per line.
+
     Returns:
-        JSON response containing a list of texts and their summaries.
+        Streamed JSON response containing a list of texts and their summaries, or a page of them.
     """
-    texts = Text.objects.all()
+    try:
+        after, limit, ndjson = page_args()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    texts_data = [
-        {
-            'id': str(text.id),
-            'text': text.content,
-            'user_uid': text.user_uid,
-            'created_at': text.created_at.isoformat(),
-            'summaries': [
-                {
-                    'id': str(summary.id),
-                    'text': summary.content,
-                    'created_at': summary.created_at.isoformat(),
-                    'percentage': summary.percentage,
-                    'words': summary.words
-                }
-                for summary in text.summaries
-            ]
-        }
-        for text in texts
-    ]
-    return jsonify(texts_data)
+    batch_size = current_app.config['LISTING_BATCH_SIZE']
+    texts = Text.get_page(after, limit).only('id', 'content', 'user_uid', 'created_at', 'summaries')
+    texts = texts.batch_size(batch_size).as_pymongo()
+    return stream_items(iter_texts_with_summaries(texts, batch_size), limit, ndjson)
 
 
 @bp.route('/texts/<text_id>/summaries', methods=['GET'])
@@ -159,14 +369,14 @@ def get_text_summaries(text_id):
         JSON response containing the text and its summaries.
     """
     text = Text.get_text_with_summaries(text_id)
-    text_summaries = [{
-        'id': str(summary.id),
-        'text': summary.content,
-        'created_at': summary.created_at.isoformat(),
-        'percentage': summary.percentage,
-        'words': summary.words
-    } for summary in text.summaries]
     if text:
+        text_summaries = [{
+            'id': str(summary.id),
+            'text': summary.content,
+            'created_at': summary.created_at.isoformat(),
+            'percentage': summary.percentage,
+            'words': summary.words
+        } for summary in text.summaries]
         return jsonify({
             'id': str(text.id),
             'text': text.content,
@@ -186,29 +396,49 @@ def upload_file():
         JSON response indicating the success or failure of the file upload,
         and the extracted text content from the uploaded file.
     """
-    if 'file' not in request.files:
+    # The upload is streamed into a spool while the form is parsed, which raises once it is too large
+    try:
+        files = request.files
+    except UploadTooLarge:
+        return jsonify({"error": "File too large"}), 413
+    if 'file' not in files:
         return jsonify({"error": "No file part"}), 400
-    file = request.files['file']
+    file = files['file']
     if file.filename == '' or not allowed_file(file.filename):
         return jsonify({"error": "No selected file or file type not allowed"}), 400
 
-    filename = secure_filename(file.filename)
-    filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+    try:
+        seed = parse_seed(request.form.get('seed'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if wants_async() and job_queue_full():
+        return jsonify({"error": "Too many summaries in progress, try again later"}), 429
 
-    # Save the file to the uploads folder
-    file.save(filepath)
+    filename = secure_filename(file.filename)
 
-    # Read the text from the file
-    text_content = read_text_from_file(filepath).replace('\n', ' ')
+    # Read the text straight from the upload, without saving it to the uploads folder. Line breaks are
+    # flattened; the page breaks of a PDF are only kept in the text handed to the summarizer, which splits
+    # long texts into sections at page ends, while the stored text is the one displayed
+    try:
+        text_content = read_upload(file).replace('\n', ' ')
+    except UploadTooLarge:
+        return jsonify({"error": "File too large"}), 413
+    except TooManyPages as e:
+        return jsonify({"error": str(e)}), 413
+    except IngestionError as e:
+        return jsonify({"error": str(e)}), 400
 
     # Create a new Text document and save it to the database
     user_uid = request.headers.get('X-User-UID')
     percentage = get_or_generate_percentage(int(request.form.get('percentage')))
-    text = Text.create_text(content=text_content, user_uid=user_uid, uploaded_filename=filename, percentage=percentage)
+    text = Text.create_text(content=text_content.replace(PAGE_BREAK, ' '), user_uid=user_uid,
+                            uploaded_filename=filename, percentage=percentage)
+
+    if wants_async():
+        return enqueue_summary(text, percentage, seed, new_text=True, content=text_content)
 
-    # Use the TextSummarizer to summarize the fetched text
-    summarizer = TextSummarizer(text.content, percentage, 8)
-    summary = summarizer.summarize()
+    # Summarize the fetched text, reusing the cached summary of an identical request
+    summary = summarize_content(text_content, percentage, seed)
     words = len(summary.split())
 
     # Save the summary to the database, linked to the original text
@@ -222,9 +452,6 @@ def upload_file():
     # Add the summary to the original text's list of summaries
     text.add_summary(new_summary)
 
-    # Delete the file from the uploads folder
-    os.remove(filepath)
-
     return jsonify({
         "message": "File uploaded successfully",
         "id": str(text.id)
@@ -248,13 +475,21 @@ def summarize():
 
     if not text_content:
         return jsonify({"error": "No text provided"}), 400
+    try:
+        seed = parse_seed(data.get('seed'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if wants_async() and job_queue_full():
+        return jsonify({"error": "Too many summaries in progress, try again later"}), 429
 
     # Create a new Text document and save it to the database
     text = Text.create_text(content=text_content, user_uid=user_uid, percentage=percentage)
 
-    # Use the TextSummarizer to summarize the fetched text
-    summarizer = TextSummarizer(text.content, percentage, 8)
-    summary = summarizer.summarize()
+    if wants_async():
+        return enqueue_summary(text, percentage, seed, new_text=True)
+
+    # Summarize the fetched text, reusing the cached summary of an identical request
+    summary = summarize_content(text.content, percentage, seed)
     words = len(summary.split())
 
     # print the summary to the console
@@ -290,6 +525,10 @@ def summarize(text_id):
         JSON response containing the generated summary.
     """
     data = request.get_json()
+    try:
+        seed = parse_seed(data.get('seed'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     # Fetch the original text using the provided text ID
     original_text = Text.get_text_by_id(text_id)
@@ -301,9 +540,11 @@ def summarize(text_id):
     else:
         percentage = get_or_generate_percentage(data.get('percentage'))
 
-    # Use the TextSummarizer to summarize the fetched text
-    summarizer = TextSummarizer(original_text.content, percentage, 8)
-    summary = summarizer.summarize()
+    if wants_async():
+        return enqueue_summary(original_text, percentage, seed)
+
+    # Summarize the fetched text, reusing the cached summary of an identical request
+    summary = summarize_content(original_text.content, percentage, seed)
     words = len(summary.split())
 
     # print the summary to the console
@@ -325,3 +566,155 @@ def summarize(text_id):
             "words": summary.words
         }
     })
+
+
+@bp.route('/summarize/multi', methods=['POST'], endpoint='summarize_multi')
+@cross_origin()
+def summarize_multi():
+    """
+    Endpoint to summarize one text at several compression rates in one pass.
+
+    The request holds either a new 'text' or the 'text_id' of a stored text, and the 'percentages'.
+    The text is parsed, compared and ranked once; only the clustering and the selection run per rate.
+
+    Returns:
+        JSON response containing the text id and one summary per percentage, in request order.
+    """
+    user_uid = request.headers.get('X-User-UID')
+    data = request.get_json()
+    percentages = data.get('percentages')
+
+    if not isinstance(percentages, list) or not percentages:
+        return jsonify({"error": "No percentages provided"}), 400
+    if len(percentages) > current_app.config['MAX_SUMMARY_RATES']:
+        return jsonify({"error": f"At most {current_app.config['MAX_SUMMARY_RATES']} percentages per request"}), 400
+    if not all(isinstance(percentage, (int, float)) and 0 < percentage <= 100 for percentage in percentages):
+        return jsonify({"error": "Percentages must be numbers between 0 and 100"}), 400
+    try:
+        seed = parse_seed(data.get('seed'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if data.get('text_id'):
+        text = Text.get_text_by_id(data.get('text_id'))
+        if not text:
+            return jsonify({"error": "Text not found"}), 404
+    elif data.get('text'):
+        text = Text.create_text(content=data.get('text'), user_uid=user_uid, percentage=percentages[0])
+    else:
+        return jsonify({"error": "No text provided"}), 400
+
+    summaries = current_app.extensions['summary_cache'].summarize_rates(text.content, percentages,
+                                                                        summarizer_options(seed))
+
+    response = []
+    for percentage in dict.fromkeys(percentages):
+        summary = Summary.create_summary(content=summaries[percentage], percentage=percentage,
+                                         words=len(summaries[percentage].split()), text=text)
+        text.add_summary(summary)
+        response.append({
+            "id": str(summary.id),
+            "text": summary.content,
+            "created_at": summary.created_at.isoformat(),
+            "percentage": summary.percentage,
+            "words": summary.words
+        })
+
+    return jsonify({
+        "id": str(text.id),
+        "summaries": response
+    }), 201
+
+
+@bp.route('/summarize/batch', methods=['POST'], endpoint='summarize_batch')
+@cross_origin()
+def summarize_batch():
+    """
+    Endpoint to summarize many texts in one request.
+
+    The texts are parsed together in batches and each one is summarized and saved like /summarize.
+
+    Returns:
+        JSON response containing one result per text in input order, each with either the text id
+        and summary or an error, and the throughput in documents per second.
+    """
+    user_uid = request.headers.get('X-User-UID')
+    data = request.get_json()
+    texts = data.get('texts')
+    percentage = get_or_generate_percentage(data.get('percentage', None))
+
+    if not isinstance(texts, list) or not texts:
+        return jsonify({"error": "No texts provided"}), 400
+    if len(texts) > current_app.config['MAX_BATCH_DOCUMENTS']:
+        return jsonify({"error": f"At most {current_app.config['MAX_BATCH_DOCUMENTS']} texts per batch"}), 413
+    try:
+        seed = parse_seed(data.get('seed'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    start = time.perf_counter()
+    results = current_app.extensions['summary_cache'].summarize_many(texts, percentage,
+                                                                      summarizer_options(seed),
+                                                                      batch_size=current_app.config['BATCH_SIZE'],
+                                                                      n_process=current_app.config['BATCH_N_PROCESS'])
+    elapsed = time.perf_counter() - start
+
+    response = []
+    for content, result in zip(texts, results):
+        if result['error']:
+            response.append({"error": result['error']})
+            continue
+        text = Text.create_text(content=content, user_uid=user_uid, percentage=percentage)
+        summary = Summary.create_summary(content=result['summary'], text=text, percentage=percentage,
+                                         words=len(result['summary'].split()))
+        text.add_summary(summary)
+        response.append({
+            "id": str(text.id),
+            "summary": {
+                "id": str(summary.id),
+                "text": summary.content,
+                "percentage": summary.percentage,
+                "words": summary.words
+            }
+        })
+
+    return jsonify({
+        "results": response,
+        "documents_per_second": len(texts) / elapsed if elapsed > 0 else None
+    }), 201
+
+
+@bp.route('/jobs/<job_id>', methods=['GET'])
+@cross_origin()
+def get_job(job_id):
+    """
+    Endpoint to poll a queued summarization job.
+
+    Parameters:
+        job_id (str): The job id returned when the summary was queued.
+
+    Returns:
+        JSON response containing the job status, and the summary once it is done.
+    """
+    summary = Summary.objects(id=job_id).first() if ObjectId.is_valid(job_id) else None
+    if not summary:
+        return jsonify({"error": "Job not found"}), 404
+
+    job = {
+        "id": str(summary.id),
+        "status": summary.status,
+        "text_id": str(summary.to_mongo().get('text')),  # Avoids loading the whole text
+    }
+    if summary.progress:
+        job["progress"] = summary.progress
+    if summary.status == Summary.FAILED:
+        job["error"] = summary.error
+    if summary.status == Summary.DONE:
+        job["summary"] = {
+            "id": str(summary.id),
+            "text": summary.content,
+            "created_at": summary.created_at.isoformat(),
+            "percentage": summary.percentage,
+            "words": summary.words
+        }
+    return jsonify(job)
@@ -1,9 +1,14 @@
 import math
 import random
-import threading
 from functools import reduce
 
-from nltk.stem.porter import PorterStemmer
+import numpy
+from app.summarizer.executors import fill_symmetric_matrix
+from app.summarizer.similarity import SimilarityEngine, SimilarityMatrix
+from app.summarizer.vocabulary import stem
+
+# The number of rows summed at once when the medoids are updated
+MEDOID_BLOCK_ROWS = 256
 
 
 def calculate_number_of_clusters_based_on_ratio(sentences, percentage):
@@ -12,63 +17,68 @@ def calculate_number_of_clusters_based_on_ratio(sentences, percentage):
     return calculated_clusters
 
 
+def pairwise_block(output, start, end, sentences, words):
+    """
+    Fills rows start:end of the upper triangle of the similarity matrix with the original pairwise loop.
+
+    For each pair the union of both bags of words is expanded with the stems of every word's synonyms,
+    and the sentences are compared by the cosine of their counts of those stems.
+    """
+    for i in range(start, end):
+        for j in range(i + 1, len(sentences)):
+            # Union of the bag of words of the two sentences
+            bag_of_words = list(set(sentences[i].bag_of_words) | set(sentences[j].bag_of_words))
+            bag_of_words = [list(
+                set([stem(synonym) for synonym in words[word].synonym_list] + [
+                    stem(word)])) for word in bag_of_words]
+
+            first_sentence_vector = [reduce(lambda x, y: x + y,
+                                            [sentences[i].stemmed_bag_of_words.count(word) for word in
+                                             synonyms], 0) for synonyms in bag_of_words]
+            second_sentence_vector = [reduce(lambda x, y: x + y,
+                                             [sentences[j].stemmed_bag_of_words.count(word) for word in
+                                              synonyms], 0) for synonyms in bag_of_words]
+
+            denominator = math.sqrt(sum([x ** 2 for x in first_sentence_vector])) * math.sqrt(
+                sum([x ** 2 for x in second_sentence_vector]))
+            if denominator == 0:
+                similarity = 0
+            else:
+                similarity = sum(
+                    [x * y for x, y in zip(first_sentence_vector, second_sentence_vector)]) / denominator
+
+            output[i, j] = similarity
+
+
 class TextClusterer:
-    def __init__(self, sentences, words, percentage, num_threads):
+    def __init__(self, sentences, words, percentage, executor=None, similarity_backend='vectorized',
+                 clustering_mode='medoids', seed=None, similarities=None, vocabulary=None):
         self.clusters = None
         self.sentences = sentences
         self.words = words
         self.percentage = percentage
-        self.num_threads = num_threads
-        self.stemmer = PorterStemmer()
-        self.similarities = None  # This will be populated by calculate_cosine_similarity
-        # print(f"Initializing TextClusterer with {len(sentences)} sentences, aiming for a {percentage}% compression rate over {num_threads} threads.")
-
-    def _cosine_similarity_thread_run(self, number_of_thread, results):
-        start_sentence_position = number_of_thread * (len(self.sentences) // self.num_threads)
-        end_sentence_position = start_sentence_position + (len(self.sentences) // self.num_threads)
-        if number_of_thread == self.num_threads - 1:
-            end_sentence_position = len(self.sentences)
-
-        for i in range(start_sentence_position, end_sentence_position):
-            for j in range(len(self.sentences)):
-                if i != j:
-                    # Union of the bag of words of the two sentences
-                    bag_of_words = list(set(self.sentences[i].bag_of_words) | set(self.sentences[j].bag_of_words))
-                    bag_of_words = [list(
-                        set([self.stemmer.stem(synonym) for synonym in self.words[word].synonym_list] + [
-                            self.stemmer.stem(word)])) for word in bag_of_words]
-
-                    first_sentence_vector = [reduce(lambda x, y: x + y,
-                                                    [self.sentences[i].stemmed_bag_of_words.count(word) for word in
-                                                     synonyms], 0) for synonyms in bag_of_words]
-                    second_sentence_vector = [reduce(lambda x, y: x + y,
-                                                     [self.sentences[j].stemmed_bag_of_words.count(word) for word in
-                                                      synonyms], 0) for synonyms in bag_of_words]
-
-                    denominator = math.sqrt(sum([x ** 2 for x in first_sentence_vector])) * math.sqrt(
-                        sum([x ** 2 for x in second_sentence_vector]))
-                    if denominator == 0:
-                        similarity = 0
-                    else:
-                        similarity = sum(
-                            [x * y for x, y in zip(first_sentence_vector, second_sentence_vector)]) / denominator
-
-                    results[number_of_thread][(i, j)] = similarity
+        self.clustering_mode = clustering_mode  # 'medoids' or the original randomly seeded 'kmeans'
+        self.seed = seed  # Seeds the k-medoids++ initialisation so a request always yields the same clusters
+        # Runs the blocks of the similarity matrix; a process executor suits the pure Python 'pairwise' backend
+        # and a thread executor the 'vectorized' one, whose NumPy products release the GIL
+        self.executor = executor
+        self.similarity_backend = similarity_backend  # 'vectorized' or the original 'pairwise' loop
+        self.vocabulary = vocabulary  # DocumentVocabulary of the sentences, built by the engine when None
+        # SimilarityMatrix populated by calculate_cosine_similarity, unless one computed earlier for the same
+        # sentences is passed in; it does not depend on the percentage
+        self.similarities = similarities
+        # print(f"Initializing TextClusterer with {len(sentences)} sentences, aiming for a {percentage}% compression rate.")
 
     def calculate_cosine_similarity(self):
-        threads = []
-        results = [{} for _ in range(self.num_threads)]
-        for number_of_thread in range(self.num_threads):
-            thread = threading.Thread(target=self._cosine_similarity_thread_run, args=(number_of_thread, results))
-            threads.append(thread)
-            thread.start()
-        for thread in threads:
-            thread.join()
-
-        # Combine results from all threads
-        self.similarities = {}
-        for thread_result in results:
-            self.similarities.update(thread_result)
+        if self.similarities is not None:
+            return
+        if self.similarity_backend == 'vectorized':
+            engine = SimilarityEngine(self.sentences, self.words, vocabulary=self.vocabulary)
+            self.similarities = engine.cosine_similarity_matrix(self.executor)
+        else:
+            self.similarities = SimilarityMatrix(fill_symmetric_matrix(
+                pairwise_block, len(self.sentences), (self.sentences, self.words), self.executor,
+                dtype=numpy.float32))
 
     def k_means(self):
         self.calculate_cosine_similarity()
@@ -81,16 +91,17 @@ class TextClusterer:
             clusters = {center: [] for center in centers}
 
             # Assign sentences to the nearest cluster
-            for i, sentence in enumerate(self.sentences):
-                closest_center = max(centers, key=lambda center: self.similarities.get((i, center), 0))
-                clusters[closest_center].append(i)
+            closest_centers = numpy.argmax(self.similarities.columns(centers), axis=1)
+            for i, closest_center in enumerate(closest_centers):
+                clusters[centers[closest_center]].append(i)
 
             # Update centers
             new_centers = []
             for center, members in clusters.items():
                 if members:
-                    new_center = max(members, key=lambda member: sum(
-                        self.similarities.get((member, other), 0) for other in members if other != member))
+                    # The diagonal is zero, so a member never counts its similarity to itself
+                    totals = self.similarities.submatrix(members).sum(axis=1, dtype=numpy.float64)
+                    new_center = members[int(numpy.argmax(totals))]
                     new_centers.append(new_center)
                 else:
                     new_centers.append(center)  # Keep the old center if no members assigned
@@ -104,9 +115,118 @@ class TextClusterer:
         self.clusters = clusters
         # print("k-means clustering completed.")
 
+    def _seed_medoids(self, number_of_clusters, rng):
+        """
+        Picks initial medoids with k-medoids++: each new medoid is drawn with probability proportional
+        to the squared distance (1 - similarity) to its closest medoid so far.
+        """
+        size = len(self.sentences)
+        centers = [int(rng.integers(size))]
+        closest_distances = 1.0 - self.similarities.row(centers[0]).astype(numpy.float64)
+        closest_distances[centers[0]] = 0
+        while len(centers) < number_of_clusters:
+            weights = closest_distances ** 2
+            total = weights.sum()
+            if total > 0:
+                center = int(rng.choice(size, p=weights / total))
+            else:
+                # Every remaining sentence is identical to a medoid, fall back to a uniform pick
+                center = int(rng.choice(numpy.setdiff1d(numpy.arange(size), centers)))
+            centers.append(center)
+            distances = 1.0 - self.similarities.row(center).astype(numpy.float64)
+            distances[center] = 0
+            numpy.minimum(closest_distances, distances, out=closest_distances)
+        return centers
+
+    def _assign_to_medoids(self, centers):
+        # Assign every sentence to its most similar medoid; a medoid always belongs to its own cluster
+        center_similarities = self.similarities.columns(centers)
+        center_similarities[centers, numpy.arange(len(centers))] = numpy.inf
+        return numpy.argmax(center_similarities, axis=1)
+
+    def k_medoids(self):
+        self.calculate_cosine_similarity()
+        if not self.sentences:
+            self.clusters = {}
+            return
+        number_of_clusters = calculate_number_of_clusters_based_on_ratio(self.sentences, self.percentage)
+        number_of_clusters = min(number_of_clusters, len(self.sentences))
+        rng = numpy.random.default_rng(self.seed)
+        self.clusters = self._k_medoids(self._seed_medoids(number_of_clusters, rng))
+
+    def k_medoids_many(self, percentages):
+        """
+        Clusters the sentences once per percentage, sharing the similarity matrix and the seeding.
+
+        k-medoids++ picks its medoids one after the other, so the first k medoids seeded for the largest
+        number of clusters are exactly the medoids seeded for k clusters. Seeding once for the largest
+        count and refining a prefix per percentage gives the same clusters as separate runs.
+
+        Args:
+            percentages (list): The compression rates as percentages.
+
+        Returns:
+            list: The clusters of every percentage, in the same order.
+        """
+        self.calculate_cosine_similarity()
+        if not self.sentences:
+            return [{} for _ in percentages]
+        counts = [min(calculate_number_of_clusters_based_on_ratio(self.sentences, percentage), len(self.sentences))
+                  for percentage in percentages]
+        rng = numpy.random.default_rng(self.seed)
+        seeds = self._seed_medoids(max(counts), rng)
+        clusterings = {count: self._k_medoids(seeds[:count]) for count in set(counts)}
+        return [clusterings[count] for count in counts]
+
+    def _k_medoids(self, initial_centers):
+        centers = numpy.array(initial_centers)
+        for iteration in range(100):  # Limit the number of iterations to prevent infinite loops
+            labels = self._assign_to_medoids(centers)
+
+            # The new medoid of a cluster is the member with the largest total similarity to the other members,
+            # summed cluster by cluster and a block of rows at a time so no n x n temporary is allocated
+            totals = numpy.empty(len(labels))
+            for cluster_id in range(len(centers)):
+                members = numpy.flatnonzero(labels == cluster_id)
+                for start in range(0, len(members), MEDOID_BLOCK_ROWS):
+                    rows = members[start:start + MEDOID_BLOCK_ROWS]
+                    block = self.similarities.values[numpy.ix_(rows, members)]
+                    totals[rows] = block.sum(axis=1, dtype=numpy.float64)
+            order = numpy.lexsort((-totals, labels))
+            first_of_cluster = numpy.flatnonzero(numpy.diff(labels[order], prepend=-1))
+            new_centers = order[first_of_cluster]
+
+            if numpy.array_equal(new_centers, centers):
+                break
+            centers = new_centers
+        else:
+            labels = self._assign_to_medoids(centers)
+
+        return {int(center): numpy.flatnonzero(labels == cluster_id).tolist()
+                for cluster_id, center in enumerate(centers)}
+
     def perform_clustering(self):
         print("Performing clustering...")
-        self.k_means()
+        if self.clustering_mode == 'medoids':
+            self.k_medoids()
+        else:
+            self.k_means()
+
+    def perform_clustering_many(self, percentages):
+        """
+        Clusters the sentences for several compression rates, see k_medoids_many.
+
+        Returns:
+            list: The clusters of every percentage, in the same order.
+        """
+        if self.clustering_mode == 'medoids':
+            return self.k_medoids_many(percentages)
+        clusterings = []
+        for percentage in percentages:
+            self.percentage = percentage
+            self.k_means()
+            clusterings.append(self.clusters)
+        return clusterings
 
     def get_clusters(self):
         # print(f"Generated {self.clusters} clusters.")
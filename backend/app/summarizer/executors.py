@@ -0,0 +1,218 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy
+
+
+def triangle_blocks(size, number_of_blocks):
+    """
+    Splits the rows of the strict upper triangle of a square matrix into contiguous blocks of similar work.
+
+    Row i of the triangle holds size - 1 - i pairs, so early blocks get fewer rows than late ones.
+
+    Args:
+        size (int): The number of rows of the matrix.
+        number_of_blocks (int): The desired number of blocks.
+
+    Returns:
+        list: A list of (row_start, row_end) tuples covering every row exactly once.
+    """
+    if size <= 0:
+        return []
+    number_of_blocks = max(1, min(number_of_blocks, size))
+    target = size * (size - 1) / 2 / number_of_blocks
+    blocks = []
+    start = 0
+    pairs = 0
+    for row in range(size):
+        pairs += size - 1 - row
+        if len(blocks) < number_of_blocks - 1 and pairs >= target * (len(blocks) + 1):
+            blocks.append((start, row + 1))
+            start = row + 1
+    if start < size:
+        blocks.append((start, size))
+    return blocks
+
+
+class SerialExecutor:
+    """
+    Runs every block in the calling thread.
+    """
+    mode = 'serial'
+
+    def __init__(self, workers=1):
+        self.workers = 1
+
+    def run_blocks(self, kernel, output, blocks, args):
+        """
+        Runs kernel(output, row_start, row_end, *args) for every block.
+
+        Args:
+            kernel (callable): The function filling rows row_start:row_end of the output in place.
+            output (numpy.ndarray): The matrix the blocks are written to.
+            blocks (list): The (row_start, row_end) blocks to compute.
+            args (tuple): Additional arguments passed to the kernel.
+        """
+        for start, end in blocks:
+            kernel(output, start, end, *args)
+
+
+class ThreadExecutor(SerialExecutor):
+    """
+    Runs blocks on a thread pool. Only useful for kernels that release the GIL, such as NumPy products.
+    """
+    mode = 'thread'
+
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def run_blocks(self, kernel, output, blocks, args):
+        # Threads share the output array, so every block writes its rows directly
+        futures = [self._get_pool().submit(kernel, output, start, end, *args) for start, end in blocks]
+        for future in futures:
+            future.result()
+
+
+def _attach(descriptor):
+    name, shape, dtype = descriptor
+    memory = shared_memory.SharedMemory(name=name)
+    return memory, numpy.ndarray(shape, dtype=dtype, buffer=memory.buf)
+
+
+def _run_shared_block(kernel, output_descriptor, start, end, args):
+    attached = []
+    try:
+        memory, output = _attach(output_descriptor)
+        attached.append(memory)
+        resolved = []
+        for arg in args:
+            if isinstance(arg, tuple) and len(arg) == 4 and arg[0] == '__shared__':
+                memory, array = _attach(arg[1:])
+                attached.append(memory)
+                resolved.append(array)
+            else:
+                resolved.append(arg)
+        kernel(output, start, end, *resolved)
+    finally:
+        for memory in attached:
+            memory.close()
+
+
+class ProcessExecutor(ThreadExecutor):
+    """
+    Runs blocks on a process pool for pure Python kernels that hold the GIL.
+
+    The output and every NumPy argument live in shared memory, so workers read their inputs and
+    write their rows in place instead of pickling partial results back to the parent. Kernels must
+    be module level functions so they can be sent to the workers.
+    """
+    mode = 'process'
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def run_blocks(self, kernel, output, blocks, args):
+        segments = []
+        try:
+            shared_output = self._share(output, segments)
+            shared_args = []
+            for arg in args:
+                if isinstance(arg, numpy.ndarray):
+                    shared_args.append(('__shared__',) + self._share(arg, segments)[1])
+                else:
+                    shared_args.append(arg)
+            output_descriptor = shared_output[1]
+            futures = [self._get_pool().submit(_run_shared_block, kernel, output_descriptor, start, end,
+                                               tuple(shared_args)) for start, end in blocks]
+            for future in futures:
+                future.result()
+            output[...] = shared_output[0]
+        finally:
+            for memory in segments:
+                memory.close()
+                memory.unlink()
+
+    @staticmethod
+    def _share(array, segments):
+        memory = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        segments.append(memory)
+        shared = numpy.ndarray(array.shape, dtype=array.dtype, buffer=memory.buf)
+        shared[...] = array
+        return shared, (memory.name, array.shape, array.dtype.str)
+
+
+EXECUTORS = {
+    SerialExecutor.mode: SerialExecutor,
+    ThreadExecutor.mode: ThreadExecutor,
+    ProcessExecutor.mode: ProcessExecutor,
+}
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(mode='serial', workers=None):
+    """
+    Returns the process-wide executor for a mode, creating its pool on first use.
+
+    Args:
+        mode (str): One of 'serial', 'thread' or 'process'.
+        workers (int, optional): The pool size. Defaults to the number of CPUs.
+
+    Returns:
+        SerialExecutor: The executor.
+
+    Raises:
+        ValueError: If the mode is unknown.
+    """
+    if mode not in EXECUTORS:
+        raise ValueError(f"Unknown executor mode: {mode}")
+    key = (mode, workers)
+    with _executors_lock:
+        if key not in _executors:
+            _executors[key] = EXECUTORS[mode](workers)
+        return _executors[key]
+
+
+def fill_symmetric_matrix(kernel, size, args, executor=None, dtype=numpy.float64):
+    """
+    Computes a symmetric matrix by running a kernel over balanced blocks of its upper triangle.
+
+    The kernel is called as kernel(output, row_start, row_end, *args) and must fill
+    output[i, j] for every row i in the block and every column j > i. The lower triangle is
+    mirrored afterwards and the diagonal is left at zero.
+
+    Args:
+        kernel (callable): The block kernel.
+        size (int): The number of rows and columns of the matrix.
+        args (tuple): Additional arguments passed to the kernel.
+        executor (SerialExecutor, optional): The executor running the blocks. Defaults to serial.
+        dtype: The dtype of the matrix.
+
+    Returns:
+        numpy.ndarray: The symmetric matrix.
+    """
+    executor = executor if executor is not None else get_executor('serial')
+    output = numpy.zeros((size, size), dtype=dtype)
+    blocks = triangle_blocks(size, executor.workers)
+    executor.run_blocks(kernel, output, blocks, tuple(args))
+
+    # Mirror the upper triangle in place, block by block, to avoid full size temporaries
+    for start, end in blocks:
+        output[start:end, :start] = output[:start, start:end].T
+        diagonal_block = output[start:end, start:end]
+        diagonal_block += diagonal_block.T
+    return output
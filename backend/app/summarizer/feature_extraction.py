@@ -1,97 +1,165 @@
 import math
 
-CUE_PHRASE_FILE = 'bonus_words'
-STIGMA_WORDS_FILE = 'stigma_words'
+import numpy
 
+from app.summarizer.term_index import TermIndex
 
-def title_word_feature(title, processed_text):
-    title_word_feature_values = []
-    word_intersection = [set(filter(lambda title_word: title_word in title.bag_of_words, sublist.bag_of_words))
-                         for sublist in processed_text]
-    for word_list in word_intersection:
-        title_word_feature_values.append(len(word_list) / len(title.bag_of_words) if title.bag_of_words else 0)
-    return title_word_feature_values
+CUE_PHRASE_FILE = 'bonus_words'
+STIGMA_WORDS_FILE = 'stigma_words'
+# The resources matched as phrases
+PHRASE_FILES = (CUE_PHRASE_FILE, STIGMA_WORDS_FILE)
+# The columns of the FeatureMatrix
+FEATURES = ('keyword', 'title_word', 'sentence_location', 'sentence_length', 'proper_noun', 'cue_phrase',
+            'nonessential', 'numerical_data')
+
+
+class FeatureMatrix:
+    """
+    The feature values of every sentence as one (sentences x features) float array.
+
+    Columns are named by self.columns. The fuzzy engine reads the array directly; the per-sentence
+    dictionaries of the original representation are still available from as_dicts() and by iterating.
+    """
+
+    def __init__(self, values, columns=FEATURES):
+        self.values = numpy.asarray(values, dtype=numpy.float64).reshape(-1, len(columns))
+        self.columns = tuple(columns)
+        self.column_index = {column: i for i, column in enumerate(self.columns)}
+
+    @classmethod
+    def from_columns(cls, columns):
+        """
+        Builds the matrix from a dictionary mapping feature names to per-sentence arrays.
+        """
+        return cls(numpy.column_stack([numpy.asarray(values, dtype=numpy.float64) for values in columns.values()])
+                   if columns else numpy.empty((0, 0)), tuple(columns))
+
+    def __len__(self):
+        return self.values.shape[0]
+
+    def __getitem__(self, i):
+        return dict(zip(self.columns, self.values[i].tolist()))
+
+    def __iter__(self):
+        return iter(self.as_dicts())
+
+    def column(self, name):
+        """
+        Returns the values of one feature.
+        """
+        return self.values[:, self.column_index[name]]
+
+    def select(self, names):
+        """
+        Returns the values of the given features, in that column order.
+        """
+        return self.values[:, [self.column_index[name] for name in names]]
+
+    def as_dicts(self):
+        """
+        Returns one dictionary of feature values per sentence, for inspection and debugging.
+        """
+        return [dict(zip(self.columns, row)) for row in self.values.tolist()]
+
+
+def _normalize(values):
+    # Scale by the largest value, leaving all-zero features at zero
+    max_value = values.max() if len(values) else 1
+    return values / max_value if max_value else values
+
+
+def title_word_feature(title, processed_text, index=None):
+    index = index if index is not None else TermIndex.from_sentences(processed_text, _term_dict(processed_text))
+    if not title.bag_of_words:
+        return numpy.zeros(len(processed_text))
+    title_words = set(title.bag_of_words)
+    # Bags of words hold every word once, so the count per sentence is the size of the intersection
+    title_word_counts = index.sentence_sums(index.term_mask(title_words.__contains__))
+    return title_word_counts / len(title.bag_of_words)
 
 
 def sentence_length_feature(sentences):
-    sentence_length_feature_values = []
-    max_length_sentence = max(len(sentence.original.split(' ')) for sentence in sentences) if sentences else 1
-    for sentence in sentences:
-        sentence_length_feature_values.append(len(sentence.original.split(' ')) / max_length_sentence)
-    return sentence_length_feature_values
+    sentence_lengths = numpy.fromiter((len(sentence.original.split(' ')) for sentence in sentences),
+                                      dtype=numpy.float64, count=len(sentences))
+    return sentence_lengths / (sentence_lengths.max() if len(sentences) else 1)
 
 
 def sentence_location_feature(sentences):
-    sentence_location_feature_values = [1 / sentence.position for sentence in sentences]
-    return sentence_location_feature_values
-
-
-def keyword_feature(sentences, words):
-    keyword_feature_values = []
-    total_number_of_sentences = len(sentences)
-    for word in words.values():
-        number_of_sentences = sum(word in sentence.bag_of_words for sentence in sentences)
-        number_of_sentences = max(number_of_sentences, 1)
-        word.term_weight = word.abs_frequency * math.log10(total_number_of_sentences / number_of_sentences)
-    for sentence in sentences:
-        sum_of_term_weights = sum(words[word].term_weight for word in sentence.bag_of_words)
-        keyword_feature_values.append(sum_of_term_weights)
-    max_value = max(keyword_feature_values, default=1)
-    return [x / max_value for x in keyword_feature_values]
-
-
-def pos_tag_feature(sentences, words, pos_tag):
-    pos_tag_words_count_list = [
-        len([word for word in sentence.bag_of_words if words[word].part_of_speech[1] == pos_tag])
-        for sentence in sentences]
-    max_value = max(pos_tag_words_count_list, default=1)
+    positions = numpy.fromiter((sentence.position for sentence in sentences), dtype=numpy.float64,
+                               count=len(sentences))
+    return 1 / positions
+
+
+def keyword_feature(sentences, words, index=None):
+    index = index if index is not None else TermIndex.from_sentences(sentences, words)
+    number_of_sentences = numpy.maximum(index.document_frequencies(), 1)
+    for word, sentence_count in zip(words.values(), number_of_sentences.tolist()):
+        word.term_weight = word.abs_frequency * math.log10(len(sentences) / sentence_count)
+    term_weights = numpy.fromiter((word.term_weight for word in words.values()), dtype=numpy.float64,
+                                  count=len(words))
+    return _normalize(index.sentence_sums(term_weights))
+
+
+def pos_tag_feature(sentences, words, pos_tag, index=None):
+    index = index if index is not None else TermIndex.from_sentences(sentences, words)
+    pos_tag_words_counts = index.sentence_sums(index.term_mask(
+        lambda word: words[word].part_of_speech[1] == pos_tag))
+    max_value = pos_tag_words_counts.max() if len(sentences) else 1
     # Adding a small value to avoid division by zero
-    return [count / (max_value + 1e-10) for count in pos_tag_words_count_list]
+    return pos_tag_words_counts / (max_value + 1e-10)
+
+
+def _term_dict(sentences):
+    # The terms of sentences preprocessed without a words dictionary, in order of first occurrence
+    return dict.fromkeys(word for sentence in sentences for word in sentence.bag_of_words)
 
 
-def phrase_feature(sentences, phrase_list):
-    phrase_frequency = [sum(phrase in sentence.original for phrase in phrase_list) / len(sentence.bag_of_words)
-                        for sentence in sentences]
-    return phrase_frequency
+def phrase_feature(sentences, phrase_list, phrase_counts=None, index=None):
+    # Whole token matches are counted by the Preprocessor's phrase matcher when it has one
+    if phrase_counts is None:
+        phrase_counts = [sum(phrase in sentence.original for phrase in phrase_list) for sentence in sentences]
+    if index is not None:
+        bag_of_words_lengths = numpy.diff(index.indptr).astype(numpy.float64)
+    else:
+        bag_of_words_lengths = numpy.fromiter((len(sentence.bag_of_words) for sentence in sentences),
+                                              dtype=numpy.float64, count=len(sentences))
+    return numpy.asarray(phrase_counts, dtype=numpy.float64).reshape(-1) / bag_of_words_lengths
 
 
 class FeatureExtractor:
 
-    def __init__(self, title, sentences, words, resources):
+    def __init__(self, title, sentences, words, resources, index=None, phrases=None):
         self.title = title
         self.sentences = sentences
         self.words = words
         self.resources = resources
+        # Phrase counts per resource from the Preprocessor; substring search is used without them
+        self.phrases = phrases
+        # The keyword, title word and part of speech features read the sentence words from the index
+        self.index = index if index is not None else TermIndex.from_sentences(sentences, words)
         self.features = self.extract_features()
 
     def extract_features(self):
-        keyword_feature_value = keyword_feature(self.sentences, self.words)
-        title_word_feature_value = title_word_feature(self.title, self.sentences)
-        sentence_location_feature_value = sentence_location_feature(self.sentences)
-        sentence_length_feature_value = sentence_length_feature(self.sentences)
-        proper_noun_feature_value = pos_tag_feature(self.sentences, self.words, 'NNP')
-        cue_phrase_feature_value = phrase_feature(self.sentences, self.resources[CUE_PHRASE_FILE])
-        stigma_phrase_feature_value = phrase_feature(self.sentences, self.resources[STIGMA_WORDS_FILE])
-        numerical_data_feature_value = pos_tag_feature(self.sentences, self.words, 'CD')
-        sentences_feature_list = []
-        for (keyword_value, title_word_value, sentence_location_value, sentence_length_value, proper_noun_value,
-             cue_phase_value, stigma_word_value, numerical_data_value) in zip(keyword_feature_value,
-                                                                              title_word_feature_value,
-                                                                              sentence_location_feature_value,
-                                                                              sentence_length_feature_value,
-                                                                              proper_noun_feature_value,
-                                                                              cue_phrase_feature_value,
-                                                                              stigma_phrase_feature_value,
-                                                                              numerical_data_feature_value):
-            sentences_feature_list.append({
-                'keyword': keyword_value,
-                'title_word': title_word_value,
-                'sentence_location': sentence_location_value,
-                'sentence_length': sentence_length_value,
-                'proper_noun': proper_noun_value,
-                'cue_phrase': cue_phase_value,
-                'nonessential': stigma_word_value,
-                'numerical_data': numerical_data_value,
-            })
-
-        return sentences_feature_list
+        """
+        Computes every feature of every sentence.
+
+        Returns:
+            FeatureMatrix: One row per sentence and one column per feature, in the order of FEATURES.
+        """
+        return FeatureMatrix.from_columns({
+            'keyword': keyword_feature(self.sentences, self.words, self.index),
+            'title_word': title_word_feature(self.title, self.sentences, self.index),
+            'sentence_location': sentence_location_feature(self.sentences),
+            'sentence_length': sentence_length_feature(self.sentences),
+            'proper_noun': pos_tag_feature(self.sentences, self.words, 'NNP', self.index),
+            'cue_phrase': phrase_feature(self.sentences, self.resources[CUE_PHRASE_FILE],
+                                         self._phrase_counts(CUE_PHRASE_FILE), self.index),
+            'nonessential': phrase_feature(self.sentences, self.resources[STIGMA_WORDS_FILE],
+                                           self._phrase_counts(STIGMA_WORDS_FILE), self.index),
+            'numerical_data': pos_tag_feature(self.sentences, self.words, 'CD', self.index),
+        })
+
+    def _phrase_counts(self, name):
+        if self.phrases is None:
+            return None
+        return self.phrases.get(name, [0] * len(self.sentences))
@@ -0,0 +1,251 @@
+import functools
+
+import numpy
+
+import app.summarizer.rules as rl
+from app.summarizer.feature_extraction import FeatureMatrix
+
+# Order of the output sets, matching the max_rules dictionary of FuzzyLogicSummarizer
+OUTPUT_SETS = ('I', 'M', 'L')
+
+
+class CompiledFuzzyEngine:
+    """
+    Fuzzy inference over all sentences of a document at once.
+
+    The membership functions, output functions and rule base are turned into arrays when the engine
+    is built. Ranking a document then fuzzifies every feature value, fires every rule and computes
+    every center of gravity with NumPy operations, one per rule rather than one per sentence. The
+    arithmetic mirrors FuzzyLogicSummarizer step by step, so the ranks are identical.
+    """
+
+    def __init__(self, mem_funcs, output_funcs, rule_base):
+        self.features = list(mem_funcs)
+        self.columns = [(feature, fuzzy_set) for feature in mem_funcs for fuzzy_set in mem_funcs[feature]]
+        column_index = {column: i for i, column in enumerate(self.columns)}
+
+        functions = [mem_funcs[feature][fuzzy_set] for feature, fuzzy_set in self.columns]
+        self.column_features = numpy.array([self.features.index(feature) for feature, _ in self.columns])
+        self.starts, self.peaks, self.ends = (numpy.array([func[key] for func in functions], dtype=float)
+                                              for key in ('start', 'peak', 'end'))
+        self.rising_k, self.rising_n = self._get_lines(self.starts, self.peaks)
+        self.falling_k, self.falling_n = self._get_lines(self.ends, self.peaks)
+
+        # Each rule becomes its output set and one array of membership columns per clause
+        self.rules = [(OUTPUT_SETS.index(rule_key[0]),
+                       [numpy.array([column_index[term] for term in clause]) for clause in clauses])
+                      for rule_key, clauses in rule_base.items()]
+
+        # The output functions sampled on the grid used by FuzzyLogicSummarizer.center_of_gravity
+        self.output_funcs = [output_funcs[key] for key in OUTPUT_SETS]
+        self.x_vals = numpy.arange(-0.4, 1.4, 0.01)
+        self.output_vals = numpy.array([self._triangle(self.x_vals, func) for func in self.output_funcs])
+        self.lookup_steps = 32
+        self._lookup_table = None
+
+        # Breakpoints of the aggregated output that do not depend on the strengths, see _integrate
+        self._sides = [self._get_lines(numpy.float64(func[zero]), numpy.float64(func['peak']))
+                       for func in self.output_funcs for zero in ('start', 'end')]
+        fixed_points = [self.x_vals[0], self.x_vals[-1]]
+        fixed_points += [func[key] for func in self.output_funcs for key in ('start', 'peak', 'end')]
+        for i, (k1, n1) in enumerate(self._sides):
+            for k2, n2 in self._sides[i + 1:]:
+                if k1 != k2:
+                    fixed_points.append((n2 - n1) / (k1 - k2))
+        self._fixed_points = numpy.array(fixed_points, dtype=float)
+
+    @staticmethod
+    def _get_lines(zeros, peaks):
+        k = 1 / (peaks - zeros)
+        n = -k * zeros
+        return k, n
+
+    def _triangle(self, x, func):
+        rising_k, rising_n = self._get_lines(numpy.float64(func['start']), numpy.float64(func['peak']))
+        falling_k, falling_n = self._get_lines(numpy.float64(func['end']), numpy.float64(func['peak']))
+        values = numpy.where(x < func['peak'], rising_k * x + rising_n, falling_k * x + falling_n)
+        return numpy.where((x < func['start']) | (x > func['end']), 0, values)
+
+    def feature_matrix(self, feature_values):
+        """
+        Returns the feature values as an array with one column per feature, in the engine's order.
+
+        Args:
+            feature_values (FeatureMatrix or list): The columnar features, or a list of dictionaries mapping
+                feature names to values.
+
+        Returns:
+            numpy.ndarray: An array of shape (sentences, features).
+        """
+        if isinstance(feature_values, FeatureMatrix):
+            return feature_values.select(self.features)
+        return numpy.array([[sentence[feature] for feature in self.features] for sentence in feature_values],
+                           dtype=float).reshape(len(feature_values), len(self.features))
+
+    def fuzzify(self, values):
+        """
+        Calculates the membership of every feature value in every fuzzy set.
+
+        Args:
+            values (numpy.ndarray): An array of shape (sentences, features).
+
+        Returns:
+            numpy.ndarray: An array of shape (sentences, columns) ordered like self.columns.
+        """
+        values = values[:, self.column_features]
+        memberships = numpy.where(values < self.peaks,
+                                  self.rising_k * values + self.rising_n,
+                                  self.falling_k * values + self.falling_n)
+        return numpy.where((values < self.starts) | (values > self.ends), 0, memberships)
+
+    def fire_rules(self, memberships):
+        """
+        Calculates the strength of each output set as the maximum over the rules concluding it.
+
+        Args:
+            memberships (numpy.ndarray): The fuzzified values as returned by fuzzify.
+
+        Returns:
+            numpy.ndarray: An array of shape (sentences, 3) with the I, M and L strengths.
+        """
+        strengths = numpy.zeros((memberships.shape[0], len(OUTPUT_SETS)))
+        for output_set, clauses in self.rules:
+            rule_strength = functools.reduce(numpy.minimum,
+                                             (memberships[:, clause].max(axis=1) for clause in clauses))
+            # fmax ignores NaN like the comparison in FuzzyLogicSummarizer._get_max_rules
+            numpy.fmax(strengths[:, output_set], rule_strength, out=strengths[:, output_set])
+        return strengths
+
+    def defuzzify(self, strengths, defuzzifier='sampled'):
+        """
+        Calculates the center of gravity of the clipped and aggregated output sets of every sentence.
+
+        Args:
+            strengths (numpy.ndarray): The output set strengths as returned by fire_rules.
+            defuzzifier (str): 'sampled' integrates on the same 0.01 grid as FuzzyLogicSummarizer,
+                'analytic' integrates the piecewise linear aggregate exactly over the same interval and
+                'lut' interpolates a table precomputed over the strength levels.
+
+        Returns:
+            numpy.ndarray: The center of gravity of every sentence.
+
+        Raises:
+            ValueError: If the defuzzifier is unknown.
+        """
+        if defuzzifier == 'sampled':
+            y_vals = numpy.minimum(strengths[:, :, None], self.output_vals[None, :, :]).max(axis=1)
+            return (numpy.trapz(y_vals * self.x_vals, x=self.x_vals, axis=1) /
+                    numpy.trapz(y_vals, x=self.x_vals, axis=1))
+        if defuzzifier == 'analytic':
+            area, moment = self._integrate(strengths)
+        elif defuzzifier == 'lut':
+            area, moment = self._interpolate(strengths)
+        else:
+            raise ValueError(f"Unknown defuzzifier: {defuzzifier}")
+        return moment / area
+
+    def _aggregate(self, x, strengths):
+        # Aggregated output at points x of shape (sentences, points)
+        values = numpy.stack([numpy.minimum(strengths[:, i, None], self._triangle(x, func))
+                              for i, func in enumerate(self.output_funcs)], axis=0)
+        return values.max(axis=0)
+
+    def _integrate(self, strengths):
+        """
+        Integrates the aggregated output and its first moment exactly.
+
+        The aggregate is linear between the triangle vertices, the points where a triangle side
+        crosses any clipping level and the points where two sides cross, so the trapezoid rule over
+        those breakpoints is exact.
+        """
+        start, end = self.x_vals[0], self.x_vals[-1]
+        level_crossings = [(strengths - n) / k for k, n in self._sides]
+        fixed_points = numpy.broadcast_to(self._fixed_points, (strengths.shape[0], len(self._fixed_points)))
+        points = numpy.sort(numpy.clip(numpy.concatenate([fixed_points] + level_crossings, axis=1), start, end), axis=1)
+        values = self._aggregate(points, strengths)
+
+        widths = numpy.diff(points, axis=1)
+        x0, x1 = points[:, :-1], points[:, 1:]
+        y0, y1 = values[:, :-1], values[:, 1:]
+        area = (widths * (y0 + y1) / 2).sum(axis=1)
+        moment = (widths * (x0 * (2 * y0 + y1) + x1 * (y0 + 2 * y1)) / 6).sum(axis=1)
+        return area, moment
+
+    def _interpolate(self, strengths):
+        """
+        Interpolates the area and moment of the aggregate from the lookup table.
+
+        Area and moment are interpolated separately, so all-zero strengths still yield 0 / 0. Their
+        ratio is poorly conditioned when an output set fires faintly, with a strength in the first two
+        cells of the table, so those sentences are integrated exactly instead.
+        """
+        table = self.lookup_table()
+        steps = table.shape[0] - 1
+        scaled = numpy.clip(strengths, 0, 1) * steps
+        lower = numpy.minimum(numpy.floor(scaled).astype(int), steps - 1)
+        fraction = scaled - lower
+
+        result = numpy.zeros((strengths.shape[0], 2))
+        for corner in range(8):
+            offsets = numpy.array([(corner >> axis) & 1 for axis in range(3)])
+            weights = numpy.prod(numpy.where(offsets, fraction, 1 - fraction), axis=1)
+            indices = lower + offsets
+            result += weights[:, None] * table[indices[:, 0], indices[:, 1], indices[:, 2]]
+
+        faint = ((scaled > 0) & (scaled < 2)).any(axis=1)
+        if faint.any():
+            result[faint] = numpy.stack(self._integrate(strengths[faint]), axis=-1)
+        return result[:, 0], result[:, 1]
+
+    def lookup_table(self):
+        """
+        Returns the table of exact areas and moments over a grid of (I, M, L) strength levels.
+
+        The table is built on first use and kept on the engine, which is shared by the process.
+
+        Returns:
+            numpy.ndarray: An array of shape (steps + 1, steps + 1, steps + 1, 2) where steps is
+            self.lookup_steps, the number of intervals per strength axis.
+        """
+        steps = self.lookup_steps
+        if self._lookup_table is None or self._lookup_table.shape[0] != steps + 1:
+            levels = numpy.linspace(0, 1, steps + 1)
+            grid = numpy.stack(numpy.meshgrid(levels, levels, levels, indexing='ij'), axis=-1).reshape(-1, 3)
+            area, moment = self._integrate(grid)
+            self._lookup_table = numpy.stack([area, moment], axis=-1).reshape(steps + 1, steps + 1, steps + 1, 2)
+        return self._lookup_table
+
+    def rank(self, values, defuzzifier='sampled'):
+        """
+        Calculates the fuzzy rank of every sentence.
+
+        Args:
+            values (numpy.ndarray): The feature values, an array of shape (sentences, features).
+            defuzzifier (str): The defuzzification method, see defuzzify.
+
+        Returns:
+            numpy.ndarray: The rank of every sentence.
+        """
+        return self.defuzzify(self.fire_rules(self.fuzzify(values)), defuzzifier)
+
+
+_engines = {}
+
+
+def get_engine(mem_funcs, output_funcs, rule_base=None):
+    """
+    Returns a compiled engine, building it only once per process for a given configuration.
+
+    Args:
+        mem_funcs (dict): The membership functions of the features.
+        output_funcs (dict): The output membership functions.
+        rule_base (dict, optional): The rule base. Defaults to rules.rule_base.
+
+    Returns:
+        CompiledFuzzyEngine: The engine.
+    """
+    rule_base = rule_base if rule_base is not None else rl.rule_base
+    key = repr((mem_funcs, output_funcs, rule_base))
+    if key not in _engines:
+        _engines[key] = CompiledFuzzyEngine(mem_funcs, output_funcs, rule_base)
+    return _engines[key]
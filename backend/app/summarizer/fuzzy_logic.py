@@ -1,16 +1,20 @@
 import numpy
 
 import app.summarizer.rules as rl
+from app.summarizer.fuzzy_engine import get_engine
 
 
 class FuzzyLogicSummarizer:
-    def __init__(self, sentences, feature_values, clusters, mem_funcs, output_funcs):
+    def __init__(self, sentences, feature_values, clusters, mem_funcs, output_funcs, defuzzifier='sampled'):
         self.sentences = sentences
         self.feature_values = feature_values
         self.clusters = clusters
         self.summary = []
         self.mem_funcs = mem_funcs
         self.output_funcs = output_funcs
+        # Ranks every sentence at once; the per-sentence methods below remain for inspecting single sentences
+        self.engine = get_engine(mem_funcs, output_funcs, rl.rule_base)
+        self.defuzzifier = defuzzifier  # 'sampled' like center_of_gravity, 'analytic' or 'lut'
         # print(self.feature_values)
 
     def fuzzify_feature(self, val, feature):
@@ -93,9 +97,10 @@ class FuzzyLogicSummarizer:
         return cog
 
     def set_fuzzy_ranks(self):
-        for (sen_obj, sentence) in zip(self.sentences, self.feature_values):
+        ranks = self.engine.rank(self.engine.feature_matrix(self.feature_values), self.defuzzifier)
+        for (sen_obj, rank) in zip(self.sentences, ranks):
             # print(sen_obj.rank)
-            sen_obj.rank = self.get_fuzzy_rank(sentence)
+            sen_obj.rank = rank
 
     def get_fuzzy_ranks(self):
         ret_val = []
@@ -106,6 +111,20 @@ class FuzzyLogicSummarizer:
 
     def summarize(self):
         self.set_fuzzy_ranks()
+        self.select_sentences()
+
+        # Joining sentence texts to form the final summary text
+        summary_text = ' '.join(sentence.original for sentence in self.summary)
+
+        # print("Summary created with {} sentences.".format(len(self.summary)))
+        return summary_text
+
+    def select_sentences(self):
+        """
+        Selects the summary from the ranked sentences, without ranking them again.
+
+        Set new clusters and call this again to summarize at another compression rate.
+        """
         ranked_sentences = sorted(self.sentences, key=lambda x: x.rank, reverse=True)
 
         # Determine how many sentences to include based on the number of clusters
@@ -116,9 +135,4 @@ class FuzzyLogicSummarizer:
 
         # Sort selected sentences by their original position to maintain narrative flow
         self.summary = sorted(selected_sentences, key=lambda x: x.position)
-
-        # Joining sentence texts to form the final summary text
-        summary_text = ' '.join(sentence.original for sentence in self.summary)
-
-        # print("Summary created with {} sentences.".format(len(self.summary)))
-        return summary_text
+        return self.summary
@@ -0,0 +1,188 @@
+import math
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from app.summarizer.text_summarizer import TextSummarizer
+
+# Where a section may end, from the most to the least natural boundary: a page break of an extracted
+# document, a paragraph, a line, a sentence and a word
+SECTION_BOUNDARIES = ('\f', '\n\n', '\n', '. ', '! ', '? ', ' ')
+
+
+def split_sections(chunks, max_chars):
+    """
+    Groups a text into sections of at most max_chars characters.
+
+    Sections end at the last page break before the limit, or failing that at the last paragraph break,
+    line break, sentence end or space, so sentences are only cut when a single one is longer than a section.
+    At most one section and one chunk are buffered at a time.
+
+    Args:
+        chunks (str or iterable): The text, or its successive chunks, e.g. the pages of an upload.
+        max_chars (int): The maximum length of a section.
+
+    Yields:
+        str: The sections, stripped of surrounding whitespace.
+    """
+    if isinstance(chunks, str):
+        chunks = (chunks,)
+    buffer = ''
+    for chunk in chunks:
+        buffer += chunk
+        while len(buffer) > max_chars:
+            cut = max_chars
+            for boundary in SECTION_BOUNDARIES:
+                position = buffer.rfind(boundary, max_chars // 2, max_chars)
+                if position >= 0:
+                    cut = position + len(boundary)
+                    break
+            section = buffer[:cut].strip()
+            buffer = buffer[cut:]
+            if section:
+                yield section
+    if buffer.strip():
+        yield buffer.strip()
+
+
+class HierarchicalSummarizer:
+    """
+    Summarizes arbitrarily long texts in bounded memory by summarizing sections and then their summaries.
+
+    The text is split into sections of at most section_chars characters, each summarized by its own
+    TextSummarizer at a share of the compression rate, and the joined section summaries are summarized
+    again at the rest of it, so the passes together keep the requested share of the sentences. Only a
+    bounded number of sections are summarized at once, so the similarity matrices never grow beyond
+    section_chars characters worth of sentences.
+    """
+
+    def __init__(self, compression_rate, section_chars=20000, workers=1, progress=None, **options):
+        """
+        Args:
+            compression_rate (float): The compression rate as a percentage.
+            section_chars (int): The maximum length of a section.
+            workers (int): The number of sections summarized in parallel threads.
+            progress (callable, optional): Called as progress(level, done, total) after every section;
+                level 0 is the section pass, level 1 the final pass, and total is None while the input
+                is streamed.
+            **options: Further TextSummarizer arguments, such as executor, pipeline or seed.
+        """
+        self.compression_rate = compression_rate
+        self.section_chars = section_chars
+        self.workers = max(1, workers)
+        self.progress = progress
+        self.options = options
+
+    def summarize(self, text):
+        """
+        Summarizes a text, or the successive chunks of one.
+
+        The first line of the text is kept as the title of every section, as TextSummarizer reads the
+        first line of a text as its title.
+
+        Args:
+            text (str or iterable): The text, or its successive chunks.
+
+        Returns:
+            str: The summary.
+        """
+        rate = self.compression_rate
+        sections = split_sections(text, self.section_chars)
+        total = None
+        if isinstance(text, str):
+            sections = list(sections)
+            total = len(sections)
+
+        sections = iter(sections)
+        first = next(sections, None)
+        if first is None:
+            return ''
+        second = next(sections, None)
+        if second is None:
+            summary = TextSummarizer(first, rate, **self.options).summarize()
+            self._report(0, 1, 1)
+            return summary
+
+        title = first.split('\n', 1)[0] if '\n' in first else None
+        length = len(text) if isinstance(text, str) else None
+        section_rate = self.section_rate(rate, length)
+        summaries = self.summarize_sections(self._with_title(title, first, second, sections), section_rate,
+                                            total=total)
+
+        joined = ' '.join(summary for summary in summaries if summary)
+        final_rate = rate * 100 / section_rate
+        if final_rate >= 100 or not joined:
+            return joined
+        # The final pass runs over the joined section summaries, which fit in about one section
+        if title is not None:
+            joined = title + '\n' + joined
+        summary = TextSummarizer(joined, final_rate, **self.options).summarize()
+        self._report(1, 1, 1)
+        return summary
+
+    def section_rate(self, rate, length=None):
+        """
+        Returns the rate the sections are summarized at before the final pass.
+
+        The rate is split evenly between the two passes when the section summaries then fit in a single
+        section, and the sections are compressed further when they would not. When even the summary would
+        be longer than a section, the sections are summarized at the requested rate and their summaries
+        are simply joined, without a final pass.
+
+        Args:
+            rate (float): The compression rate as a percentage.
+            length (int, optional): The length of the text, unknown when it is streamed.
+
+        Returns:
+            float: The compression rate of every section as a percentage.
+        """
+        fraction = rate / 100
+        if length is None or fraction >= 1 or length * fraction > self.section_chars:
+            return rate
+        return 100 * min(math.sqrt(fraction), self.section_chars / length)
+
+    @staticmethod
+    def _with_title(title, first, second, sections):
+        yield first
+        yield second if title is None else title + '\n' + second
+        for section in sections:
+            yield section if title is None else title + '\n' + section
+
+    def summarize_sections(self, sections, rate, level=0, total=None):
+        """
+        Summarizes every section at a rate, in order, with at most twice as many sections in flight as workers.
+
+        Args:
+            sections (iterable): The section texts.
+            rate (float): The compression rate of every section as a percentage.
+            level (int): The depth of this pass, reported to the progress callback.
+            total (int, optional): The number of sections, if known.
+
+        Returns:
+            list: The summary of every section.
+        """
+        def summarize_section(section):
+            return TextSummarizer(section, rate, **self.options).summarize()
+
+        summaries = []
+        if self.workers == 1:
+            for section in sections:
+                summaries.append(summarize_section(section))
+                self._report(level, len(summaries), total)
+            return summaries
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='summary-section') as pool:
+            pending = deque()
+            for section in sections:
+                if len(pending) >= 2 * self.workers:
+                    summaries.append(pending.popleft().result())
+                    self._report(level, len(summaries), total)
+                pending.append(pool.submit(summarize_section, section))
+            while pending:
+                summaries.append(pending.popleft().result())
+                self._report(level, len(summaries), total)
+        return summaries
+
+    def _report(self, level, done, total):
+        if self.progress is not None:
+            self.progress(level, done, total)
+
@@ -0,0 +1,243 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+
+import spacy
+from spacy.matcher import PhraseMatcher
+
+from app.summarizer.synonyms import DEFAULT_INDEX_PATH, SynonymIndex
+from app.summarizer.utils.helpers import resource_loader
+
+try:
+    import resource
+except ImportError:
+    # The resource module is not available on Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = 'en_core_web_sm'
+# Named entities are never used; lemmas, stop words and sentence boundaries need the other components
+DEFAULT_EXCLUDE = ('ner',)
+
+
+def resident_memory_bytes():
+    """
+    Returns the resident set size of the current process.
+
+    Reads /proc/self/statm where available and falls back to the peak RSS reported by getrusage.
+
+    Returns:
+        int or None: The resident memory in bytes, or None if it cannot be determined on this platform.
+    """
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    if resource is not None:
+        # ru_maxrss is reported in kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return None
+
+
+class NLPPipeline:
+    """
+    A loaded spaCy model together with the summarizer resources.
+
+    Instances are shared read-only by every request served by the process, so nothing
+    document specific may be stored on them.
+    """
+
+    def __init__(self, model_name, exclude, nlp, resources, load_seconds, memory_before, memory_after,
+                 synonyms=None):
+        self.model_name = model_name
+        self.exclude = exclude
+        self.nlp = nlp
+        self.resources = resources
+        self.synonyms = synonyms  # SynonymIndex, or None when synonym expansion is off
+        self.load_seconds = load_seconds
+        self.memory_before = memory_before
+        self.memory_after = memory_after
+        self._resources_digest = None
+        self._phrase_matchers = {}
+        self._lock = threading.Lock()
+
+    @property
+    def resources_digest(self):
+        """
+        A hash of the resource sets, computed once since the resources never change after loading.
+        """
+        if self._resources_digest is None:
+            digest = hashlib.sha256()
+            for name in sorted(self.resources):
+                digest.update(name.encode('utf-8') + b'\0')
+                for item in sorted(self.resources[name]):
+                    digest.update(item.encode('utf-8') + b'\n')
+            self._resources_digest = digest.hexdigest()
+        return self._resources_digest
+
+    def phrase_matcher(self, names):
+        """
+        Returns a matcher of every phrase of the given resource sets, compiled once per pipeline.
+
+        Phrases are tokenized like the documents and matched case-insensitively on whole tokens. The match
+        id of every phrase is the string store hash of its resource name, so one pass over a document finds
+        the phrases of every set. Empty phrases are skipped.
+
+        Args:
+            names (tuple): The names of the resource sets.
+
+        Returns:
+            spacy.matcher.PhraseMatcher: The matcher.
+        """
+        names = tuple(names)
+        matcher = self._phrase_matchers.get(names)
+        if matcher is None:
+            with self._lock:
+                matcher = self._phrase_matchers.get(names)
+                if matcher is None:
+                    matcher = PhraseMatcher(self.nlp.vocab, attr='LOWER')
+                    for name in names:
+                        phrases = sorted(phrase.strip() for phrase in self.resources[name] if phrase.strip())
+                        matcher.add(name, list(self.nlp.tokenizer.pipe(phrases)))
+                    self._phrase_matchers[names] = matcher
+        return matcher
+
+    def stats(self):
+        """
+        Returns the load statistics of the pipeline, used to size the number of workers.
+
+        Returns:
+            dict: The model name, load time in seconds and resident memory of the process around the load.
+        """
+        memory_delta = None
+        if self.memory_before is not None and self.memory_after is not None:
+            memory_delta = self.memory_after - self.memory_before
+        return {
+            'pid': os.getpid(),
+            'model': self.model_name,
+            'exclude': list(self.exclude),
+            'pipes': list(self.nlp.pipe_names),
+            'synonym_index': self.synonyms.path if self.synonyms is not None else None,
+            'load_seconds': round(self.load_seconds, 4),
+            'rss_before_bytes': self.memory_before,
+            'rss_after_bytes': self.memory_after,
+            'rss_delta_bytes': memory_delta,
+            'rss_current_bytes': resident_memory_bytes(),
+        }
+
+
+class PipelineRegistry:
+    """
+    Process-wide registry of NLP pipelines.
+
+    Each (model, excluded components) combination is loaded at most once per process and
+    then handed out to every TextSummarizer. The defaults can be changed per worker with
+    configure(), e.g. from create_app() or a gunicorn post_fork hook.
+    """
+
+    def __init__(self, model_name=DEFAULT_MODEL, exclude=DEFAULT_EXCLUDE, synonym_index_path=DEFAULT_INDEX_PATH):
+        self.model_name = model_name
+        self.exclude = tuple(exclude)
+        self.synonym_index_path = synonym_index_path
+        self._pipelines = {}
+        self._lock = threading.Lock()
+
+    def configure(self, model_name=None, exclude=None, synonym_index_path=None):
+        """
+        Sets the model and excluded components used when get() is called without arguments.
+
+        Args:
+            model_name (str, optional): The spaCy model to load.
+            exclude (iterable, optional): The pipeline components to exclude when loading the model.
+            synonym_index_path (str, optional): The synonym index built by `python -m app.summarizer.synonyms
+                build`. An empty string turns synonym expansion off.
+        """
+        if model_name:
+            self.model_name = model_name
+        if exclude is not None:
+            self.exclude = tuple(exclude)
+        if synonym_index_path is not None:
+            self.synonym_index_path = synonym_index_path
+
+    def get(self, model_name=None, exclude=None):
+        """
+        Returns the shared pipeline, loading it on first use.
+
+        Args:
+            model_name (str, optional): The spaCy model to load. Defaults to the configured model.
+            exclude (iterable, optional): The components to exclude. Defaults to the configured components.
+
+        Returns:
+            NLPPipeline: The loaded pipeline.
+        """
+        key = (model_name or self.model_name, tuple(self.exclude if exclude is None else exclude))
+        pipeline = self._pipelines.get(key)
+        if pipeline is None:
+            with self._lock:
+                pipeline = self._pipelines.get(key)
+                if pipeline is None:
+                    pipeline = self._load(*key)
+                    self._pipelines[key] = pipeline
+        return pipeline
+
+    def warm(self):
+        """
+        Loads the configured pipeline ahead of the first request.
+
+        Returns:
+            NLPPipeline: The loaded pipeline.
+        """
+        return self.get()
+
+    def stats(self):
+        """
+        Returns the load statistics of every pipeline loaded in this process.
+
+        Returns:
+            list: A list of dictionaries as returned by NLPPipeline.stats.
+        """
+        return [pipeline.stats() for pipeline in list(self._pipelines.values())]
+
+    def clear(self):
+        """
+        Drops every loaded pipeline so the next get() reloads it.
+        """
+        with self._lock:
+            self._pipelines = {}
+
+    def _load(self, model_name, exclude):
+        memory_before = resident_memory_bytes()
+        start = time.perf_counter()
+        nlp = spacy.load(model_name, exclude=list(exclude))
+        resources = resource_loader()
+        synonyms = None
+        if self.synonym_index_path:
+            synonyms = SynonymIndex(self.synonym_index_path)
+            if not synonyms.available:
+                logger.warning(f"Synonym index {self.synonym_index_path} not found, synonym expansion is off. "
+                               f"Build it with: python -m app.summarizer.synonyms build")
+                synonyms = None
+        load_seconds = time.perf_counter() - start
+        return NLPPipeline(model_name, exclude, nlp, resources, load_seconds, memory_before, resident_memory_bytes(),
+                           synonyms)
+
+
+registry = PipelineRegistry()
+
+
+def get_pipeline(model_name=None, exclude=None):
+    """
+    Returns the process-wide shared pipeline.
+
+    Args:
+        model_name (str, optional): The spaCy model to load. Defaults to the configured model.
+        exclude (iterable, optional): The components to exclude. Defaults to the configured components.
+
+    Returns:
+        NLPPipeline: The loaded pipeline.
+    """
+    return registry.get(model_name, exclude)
@@ -123,14 +123,40 @@
 #         # print(f"Preprocessing completed. Processed {len(sentences)} sentences.")
 #         return title, sentences, words
 
-import spacy
+from bisect import bisect_right
+from collections import namedtuple
 
-from app.summarizer.textClasses import Title, Sentence, Word
+from app.summarizer.pipeline import get_pipeline
+from app.summarizer.term_index import TermIndex
+from app.summarizer.textClasses import DocumentModel, Title, Sentence, Word
+from app.summarizer.vocabulary import DocumentVocabulary
+
+# The result of preprocessing; the index maps the words of every sentence to the sentences holding them,
+# phrases maps resource names to the number of distinct phrases of that resource found in every sentence
+# and the vocabulary maps every word and its synonyms to the stems the sentences are compared on
+PreprocessedText = namedtuple('PreprocessedText', ['title', 'sentences', 'words', 'index', 'phrases', 'vocabulary'])
+
+
+def prepare_text(text):
+    """
+    Returns a text as it is parsed: leading newlines are trimmed and the page breaks of an extracted
+    document become spaces, since a sentence may continue on the next page.
+
+    Args:
+        text (str): The text to summarize.
+
+    Returns:
+        str: The text to hand to spaCy.
+    """
+    return text.lstrip('\n').replace('\f', ' ')
 
 
 class Preprocessor:
-    def __init__(self):
-        self.nlp = spacy.load("en_core_web_sm")
+    def __init__(self, nlp=None, phrase_matcher=None, synonyms=None):
+        # Reuse the process-wide model instead of loading en_core_web_sm for every document
+        self.nlp = nlp if nlp is not None else get_pipeline().nlp
+        self.phrase_matcher = phrase_matcher  # Finds the cue and stigma phrases while the Doc is at hand
+        self.synonyms = synonyms  # The prebuilt WordNet SynonymIndex, or None
 
     def lemmatize_and_filter(self, text: object) -> object:
         """
@@ -148,18 +174,17 @@ class Preprocessor:
 
     def get_synonyms(self, word):
         """
-        Get the synonyms of a word using spaCy's WordNet integration.
+        Get the synonyms of a word from the prebuilt WordNet synonym index.
 
         Args:
             word (str): The word to find synonyms for.
 
         Returns:
-            list: A list of synonyms for the input word.
+            list: A list of synonyms for the input word, empty when no index is configured.
         """
-        # This functionality requires additional setup in spaCy or usage of NLTK's WordNet
-        # For simplicity, this function is left as a placeholder. Integration with WordNet can be complex
-        # and is optional for initial improvements.
-        return []
+        if self.synonyms is None:
+            return []
+        return list(self.synonyms.lookup(word))
 
     def pre_process_text(self, text):
         """
@@ -169,43 +194,89 @@ class Preprocessor:
             text (str): The input text to preprocess.
 
         Returns:
-            list: A list containing the title, sentences, and words of the preprocessed text.
+            PreprocessedText: The title, sentences, words and term index of the preprocessed text.
         """
 
-        # Trim leading newlines
-        text = text.lstrip('\n')
-
-        # Attempt to split the text into title and body
-        text_split = text.split('\n', 1)
-
-        if len(text_split) == 2:
-            # If text naturally splits into title and body
-            title_text, body_text = text_split
-        elif len(text_split) == 1:
-            # If there's only one part, take the first 10 words as the title
-            body_text = text_split[0]
-            # Tokenize the body text and take the first 10 words as the title
-            body_tokens = self.nlp(body_text)
-            title_text = ' '.join([token.text for token in body_tokens[:10]])
+        # Parse the whole document once
+        return self.pre_process_doc(self.nlp(prepare_text(text)))
+
+    def pre_process_doc(self, doc):
+        """
+        Derive the title, sentences and words of a document from its parsed Doc.
+
+        The first line is the title when the text has a newline, otherwise the first 10 tokens are.
+
+        Args:
+            doc (spacy.tokens.Doc): The parsed document, of the text returned by prepare_text.
+
+        Returns:
+            PreprocessedText: The title, sentences, words and term index of the preprocessed text.
+        """
+        newline = doc.text.find('\n')
+        if newline >= 0:
+            # The text naturally splits into a title line and a body
+            body_start = next((token.i for token in doc if token.idx > newline), len(doc))
+            title_tokens = [token for token in doc[:body_start] if token.idx < newline]
+            title_text = doc.text[:newline]
         else:
-            # Fallback for unexpected cases (e.g., empty string)
-            title_text = "Untitled"
-            body_text = ""
+            # If there's only one line, take the first 10 tokens as the title
+            body_start = 0
+            title_tokens = list(doc[:10])
+            title_text = ' '.join([token.text for token in title_tokens]) if title_tokens else "Untitled"
 
-        title = Title(title_text, self.lemmatize_and_filter(title_text))
+        title = Title(title_text, [token.lemma_.lower() for token in title_tokens
+                                   if not token.is_stop and not token.is_punct])
         sentences = []
+        spans = []
         words = {}
+        model = DocumentModel()
 
-        for sent in self.nlp(body_text).sents:
-            lemmas = [token.lemma_.lower() for token in sent if not token.is_stop and not token.is_punct]
-            unique_lemmas = set(lemmas)
-            for lemma in unique_lemmas:
+        for sent in doc.sents:
+            if sent.end <= body_start:
+                continue
+            sent = doc[max(sent.start, body_start):sent.end]
+            lemma_ids = [model.lemma_id(token.lemma_.lower()) for token in sent
+                         if not token.is_stop and not token.is_punct]
+            if not lemma_ids:
+                continue
+            sentence_text = sent.text
+            for lemma_id in dict.fromkeys(lemma_ids):
+                lemma = model.vocabulary[lemma_id]
                 if lemma not in words:
-                    words[lemma] = Word(lemma, sent.text, self.get_synonyms(lemma))
+                    words[lemma] = Word(lemma, sentence_text, self.get_synonyms(lemma))
                 else:
                     words[lemma].increment_abs_frequency()
-            if lemmas:
-                sentence = Sentence(sent.text, len(sentences) + 1, list(unique_lemmas), lemmas, sent.text[-1])
-                sentences.append(sentence)
+            sentences.append(Sentence.from_model(model, model.add_sentence(lemma_ids), sentence_text,
+                                                 len(sentences) + 1))
+            spans.append((sent.start, sent.end))
+        model.freeze()
+
+        return PreprocessedText(title, sentences, words, TermIndex.from_model(model),
+                                self.count_phrases(doc, spans), DocumentVocabulary(model, words))
+
+    def count_phrases(self, doc, spans):
+        """
+        Counts the distinct phrases of every resource matched within each sentence, in one pass over the Doc.
+
+        Args:
+            doc (spacy.tokens.Doc): The parsed document.
+            spans (list): The (start, end) token offsets of the sentences, in order.
 
-        return title, sentences, words
+        Returns:
+            dict or None: The counts per sentence of every resource with a match, or None without a matcher.
+        """
+        if self.phrase_matcher is None:
+            return None
+        starts = [start for start, _ in spans]
+        counts = {}
+        seen = set()
+        for match_id, start, end in self.phrase_matcher(doc):
+            position = bisect_right(starts, start) - 1
+            if position < 0 or end > spans[position][1]:
+                continue
+            key = (match_id, position, doc[start:end].text.lower())
+            if key not in seen:
+                seen.add(key)
+                name = self.nlp.vocab.strings[match_id]
+                counts.setdefault(name, [0] * len(spans))[position] += 1
+        return counts
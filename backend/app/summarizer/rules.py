@@ -62,13 +62,23 @@ def print_rules_results(sentence):
         print("\t" + "%3s" % key + ": " + "%.2f" % calculate_rule(sentence, rules[key]))
 
 
-rules = {
-    'I1': lambda data: min(max(data['keyword']['VH'], data['keyword']['H']),
-                           max(data['title_word']['H'], data['title_word']['M']), data['cue_phrase']['H'],
-                           data['nonessential']['L'],
-                           max(data['proper_noun']['H'], data['proper_noun']['M']),
-                           max(data['numerical_data']['H'], data['numerical_data']['M']),
-                           data['sentence_location']['H'],
-                           max(data['sentence_length']['L'], data['sentence_length']['M'],
-                               data['sentence_length']['H'], data['sentence_length']['VH'])),
+# Each rule is the minimum of its clauses, and each clause is the maximum of the listed
+# (feature, fuzzy set) memberships. The first letter of the key is the output set (I, M or L).
+rule_base = {
+    'I1': [[('keyword', 'VH'), ('keyword', 'H')],
+           [('title_word', 'H'), ('title_word', 'M')],
+           [('cue_phrase', 'H')],
+           [('nonessential', 'L')],
+           [('proper_noun', 'H'), ('proper_noun', 'M')],
+           [('numerical_data', 'H'), ('numerical_data', 'M')],
+           [('sentence_location', 'H')],
+           [('sentence_length', 'L'), ('sentence_length', 'M'), ('sentence_length', 'H'),
+            ('sentence_length', 'VH')]],
 }
+
+
+def make_rule(clauses):
+    return lambda data: min(max(data[feature][fuzzy_set] for feature, fuzzy_set in clause) for clause in clauses)
+
+
+rules = {rule_key: make_rule(clauses) for rule_key, clauses in rule_base.items()}
@@ -0,0 +1,165 @@
+import numpy
+
+from app.summarizer.executors import fill_symmetric_matrix
+from app.summarizer.vocabulary import DocumentVocabulary, TermMatrix, stem
+
+# The number of sentences whose terms are expanded to a dense tile at once
+TERM_BLOCK_ROWS = 256
+
+
+class SimilarityMatrix:
+    """
+    Compact symmetric sentence similarity matrix.
+
+    Similarities are stored once as a float32 array with a zero diagonal, which takes a few bytes
+    per pair instead of a boxed float and a tuple key in a dictionary. Consumers read it through
+    the accessors below rather than indexing the array themselves.
+    """
+
+    def __init__(self, values):
+        self.values = numpy.ascontiguousarray(values, dtype=numpy.float32)
+        self.values.setflags(write=False)
+
+    @classmethod
+    def from_packed(cls, packed, size):
+        """
+        Rebuilds a matrix from the values returned by packed().
+
+        Args:
+            packed (numpy.ndarray): The strict upper triangle in row-major order.
+            size (int): The number of sentences.
+
+        Returns:
+            SimilarityMatrix: The matrix.
+        """
+        values = numpy.zeros((size, size), dtype=numpy.float32)
+        rows, columns = numpy.triu_indices(size, 1)
+        values[rows, columns] = packed
+        values[columns, rows] = packed
+        return cls(values)
+
+    def __len__(self):
+        return self.values.shape[0]
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes
+
+    def get(self, i, j):
+        """
+        Returns the similarity of sentences i and j, zero when i == j.
+        """
+        return float(self.values[i, j])
+
+    def row(self, i):
+        """
+        Returns the similarities of sentence i to every sentence.
+        """
+        return self.values[i]
+
+    def columns(self, indices):
+        """
+        Returns the similarities of every sentence to the given sentences, one column per index.
+        """
+        return self.values[:, indices]
+
+    def submatrix(self, indices):
+        """
+        Returns the similarities among the given sentences.
+        """
+        return self.values[numpy.ix_(indices, indices)]
+
+    def packed(self):
+        """
+        Returns the strict upper triangle in row-major order, half the size of the full matrix.
+        """
+        return self.values[numpy.triu_indices(len(self), 1)]
+
+
+class SimilarityEngine:
+    """
+    Computes the cosine similarity of every pair of sentences with a handful of matrix products.
+
+    The pairwise definition used by the clusterer compares two sentences over the union of their
+    bags of words, where every word stands for its stem and the stems of its synonyms, and counts
+    how often those features occur in each sentence's stemmed bag of words. Here the weight of
+    every word in every sentence is computed once into a sparse term matrix, and the restriction to the
+    union of each pair is expressed with a membership mask, so the results match the pairwise loop.
+    """
+
+    def __init__(self, sentences, words, stemmer=None, vocabulary=None):
+        self.sentences = sentences
+        self.words = words
+        # Words are stemmed with the process-wide memoized stemmer unless another one is given
+        self.stemmer = stemmer
+        self.vocabulary = vocabulary  # DocumentVocabulary shared with the features, built on demand
+
+    def build_term_matrices(self):
+        """
+        Builds the word weights and the word membership of the sentences.
+
+        Returns:
+            TermMatrix: The synonym-expanded counts of every word in every sentence, and which words are
+            present in each sentence's bag of words, stored sparsely. Words that never receive a weight
+            are dropped.
+        """
+        if self.vocabulary is None:
+            stem_function = self.stemmer.stem if self.stemmer is not None else stem
+            self.vocabulary = DocumentVocabulary.from_sentences(self.sentences, self.words, stem_function)
+        return self.vocabulary.term_matrices()
+
+    def cosine_similarity_matrix(self, executor=None):
+        """
+        Calculates the cosine similarity matrix of the sentences.
+
+        Args:
+            executor (SerialExecutor, optional): The executor running the blocks of the upper triangle.
+                NumPy releases the GIL during the products, so a thread executor gives real speedup.
+
+        Returns:
+            SimilarityMatrix: The symmetric similarity matrix. The diagonal is zero because a sentence
+            is never compared with itself.
+        """
+        terms = self.build_term_matrices()
+        args = (terms.indptr, terms.indices, terms.weights, terms.membership, terms.width,
+                terms.squared_inside_sums())
+        return SimilarityMatrix(fill_symmetric_matrix(cosine_block, len(self.sentences), args, executor,
+                                                      dtype=numpy.float32))
+
+
+def cosine_block(output, start, end, indptr, indices, weights, membership, width, squared_inside_sums):
+    """
+    Fills rows start:end of the upper triangle of the cosine similarity matrix.
+
+    Every pair is compared over the union of both bags of words: the words of sentence i with the
+    full weight of sentence j, plus the words of sentence j that sentence i lacks. The sparse term
+    matrix is expanded TERM_BLOCK_ROWS sentences at a time, so only two dense tiles exist at once.
+    """
+    terms = TermMatrix(indptr, indices, weights, membership, width)
+    size = len(terms)
+    for row_start in range(start, end, TERM_BLOCK_ROWS):
+        row_end = min(row_start + TERM_BLOCK_ROWS, end)
+        rows = slice(row_start, row_end)
+        row_weights, row_membership = terms.dense_rows(row_start, row_end)
+        row_inside = row_weights * row_membership
+        row_outside = row_weights - row_inside
+        row_squared_outside = row_outside ** 2
+
+        for column_start in range(row_start, size, TERM_BLOCK_ROWS):
+            column_end = min(column_start + TERM_BLOCK_ROWS, size)
+            columns = slice(column_start, column_end)
+            column_weights, column_membership = terms.dense_rows(column_start, column_end)
+            column_inside = column_weights * column_membership
+            column_squared_outside = (column_weights - column_inside) ** 2
+
+            dot_products = (row_inside @ column_weights.T + row_outside @ column_inside.T).astype(numpy.float64)
+            row_norms = numpy.sqrt((squared_inside_sums[rows, None] +
+                                    row_squared_outside @ column_membership.T).astype(numpy.float64))
+            column_norms = numpy.sqrt((squared_inside_sums[None, columns] +
+                                       row_membership @ column_squared_outside.T).astype(numpy.float64))
+            denominators = row_norms * column_norms
+            similarities = numpy.zeros_like(dot_products)
+            numpy.divide(dot_products, denominators, out=similarities, where=denominators != 0)
+            if column_start == row_start:
+                similarities = numpy.triu(similarities, 1)
+            output[rows, columns] = similarities
@@ -0,0 +1,138 @@
+import argparse
+import functools
+import hashlib
+import os
+import sqlite3
+import threading
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))),
+                                  'instance', 'wordnet_synonyms.sqlite3')
+
+
+def wordnet_synonyms(wordnet=None):
+    """
+    Yields every single-word WordNet lemma with the other single-word lemmas of all its synsets.
+
+    Multi-word lemmas are skipped since they can never match a token of a sentence.
+
+    Args:
+        wordnet (optional): The WordNet corpus reader. Defaults to nltk.corpus.wordnet.
+
+    Yields:
+        tuple: The lowercased lemma and the sorted list of its synonyms.
+    """
+    if wordnet is None:
+        from nltk.corpus import wordnet
+    for lemma in wordnet.all_lemma_names():
+        if '_' in lemma:
+            continue
+        synonyms = {name.lower() for synset in wordnet.synsets(lemma) for name in synset.lemma_names()
+                    if '_' not in name}
+        synonyms.discard(lemma.lower())
+        yield lemma.lower(), sorted(synonyms)
+
+
+def build_index(path, entries):
+    """
+    Writes a synonym index to an SQLite file, replacing any existing one.
+
+    Args:
+        path (str): The index file to write.
+        entries (iterable): (lemma, synonyms) pairs, for example from wordnet_synonyms().
+
+    Returns:
+        str: The digest of the index, stored in the file and used to tell index versions apart.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temporary_path = path + '.tmp'
+    if os.path.exists(temporary_path):
+        os.remove(temporary_path)
+
+    digest = hashlib.sha256()
+    connection = sqlite3.connect(temporary_path)
+    try:
+        connection.execute('CREATE TABLE synonyms (lemma TEXT PRIMARY KEY, synonyms TEXT NOT NULL) WITHOUT ROWID')
+        connection.execute('CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL) WITHOUT ROWID')
+        rows = []
+        for lemma, synonyms in sorted(entries):
+            if not synonyms:
+                continue
+            value = ' '.join(synonyms)
+            digest.update(f'{lemma}\t{value}\n'.encode('utf-8'))
+            rows.append((lemma, value))
+        connection.executemany('INSERT OR REPLACE INTO synonyms VALUES (?, ?)', rows)
+        connection.execute("INSERT INTO meta VALUES ('digest', ?)", (digest.hexdigest(),))
+        connection.commit()
+    finally:
+        connection.close()
+    # Replace the index atomically so running workers never see a partial file
+    os.replace(temporary_path, path)
+    return digest.hexdigest()
+
+
+class SynonymIndex:
+    """
+    Read-only synonym lookups from an index written by build_index.
+
+    The file is opened on first use, read-only and immutable, so any number of worker processes share
+    it through the operating system's page cache. Lookups are memoized per process.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._connection = None
+        self._digest = None
+        self._lock = threading.Lock()
+        self.lookup = functools.lru_cache(maxsize=65536)(self._lookup)
+
+    @property
+    def available(self):
+        return os.path.isfile(self.path)
+
+    def _connect(self):
+        if self._connection is None:
+            with self._lock:
+                if self._connection is None:
+                    uri = 'file:' + os.path.abspath(self.path) + '?mode=ro&immutable=1'
+                    self._connection = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        return self._connection
+
+    def _lookup(self, lemma):
+        row = self._connect().execute('SELECT synonyms FROM synonyms WHERE lemma = ?', (lemma,)).fetchone()
+        return tuple(row[0].split(' ')) if row else ()
+
+    @property
+    def digest(self):
+        """
+        The digest stored when the index was built.
+        """
+        if self._digest is None:
+            row = self._connect().execute("SELECT value FROM meta WHERE key = 'digest'").fetchone()
+            self._digest = row[0] if row else ''
+        return self._digest
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+        self.lookup.cache_clear()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the WordNet synonym index used by the summarizer.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help="Build the index from the NLTK WordNet corpus.")
+    build.add_argument('--output', default=os.getenv('SYNONYM_INDEX_PATH') or DEFAULT_INDEX_PATH,
+                       help="The index file to write.")
+    arguments = parser.parse_args(argv)
+
+    if arguments.command == 'build':
+        import nltk
+        nltk.download('wordnet', quiet=True)
+        digest = build_index(arguments.output, wordnet_synonyms())
+        print(f"Wrote synonym index {arguments.output} ({digest[:12]})")
+
+
+if __name__ == '__main__':
+    main()
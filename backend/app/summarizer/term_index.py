@@ -0,0 +1,93 @@
+import numpy
+
+
+class TermIndex:
+    """
+    Inverted index between the sentences of a document and the words of their bags of words.
+
+    The sentence to word incidence is stored in compressed sparse row form: the words of sentence i are
+    terms[indices[indptr[i]:indptr[i + 1]]], in the order of its bag of words. Document frequencies,
+    postings and per-sentence sums over any per-word array are then single NumPy calls instead of a scan
+    of every sentence for every word.
+    """
+
+    def __init__(self, terms, indptr, indices):
+        self.terms = terms
+        self.columns = {term: column for column, term in enumerate(terms)}
+        self.indptr = indptr
+        self.indices = indices
+        # The sentence of every entry of indices, used to reduce per-entry values to per-sentence values
+        self.rows = numpy.repeat(numpy.arange(len(indptr) - 1), numpy.diff(indptr))
+        self._postings = None
+
+    @classmethod
+    def from_sentences(cls, sentences, words):
+        """
+        Builds the index of the preprocessed sentences.
+
+        Args:
+            sentences (list): The Sentence objects.
+            words (dict): The Word objects by lemma; their order is the order of the terms.
+
+        Returns:
+            TermIndex: The index.
+        """
+        terms = list(words)
+        columns = {term: column for column, term in enumerate(terms)}
+        lengths = [len(sentence.bag_of_words) for sentence in sentences]
+        indptr = numpy.zeros(len(sentences) + 1, dtype=numpy.int64)
+        numpy.cumsum(lengths, out=indptr[1:])
+        indices = numpy.fromiter((columns[word] for sentence in sentences for word in sentence.bag_of_words),
+                                 dtype=numpy.int64, count=int(indptr[-1]))
+        return cls(terms, indptr, indices)
+
+    @classmethod
+    def from_model(cls, model):
+        """
+        Returns the index of a DocumentModel, sharing its arrays. The terms are the model's vocabulary.
+        """
+        return cls(model.vocabulary, model.bag_offsets, model.bag_ids)
+
+    @property
+    def number_of_sentences(self):
+        return len(self.indptr) - 1
+
+    def document_frequencies(self):
+        """
+        Returns the number of sentences containing each term.
+        """
+        return numpy.bincount(self.indices, minlength=len(self.terms))
+
+    def postings(self, term):
+        """
+        Returns the positions (0-based) of the sentences containing a term, in ascending order.
+        """
+        if self._postings is None:
+            order = numpy.argsort(self.indices, kind='stable')
+            boundaries = numpy.zeros(len(self.terms) + 1, dtype=numpy.int64)
+            numpy.cumsum(self.document_frequencies(), out=boundaries[1:])
+            self._postings = (self.rows[order], boundaries)
+        rows, boundaries = self._postings
+        column = self.columns[term]
+        return rows[boundaries[column]:boundaries[column + 1]]
+
+    def sentence_sums(self, term_values):
+        """
+        Sums a per-term value over the bag of words of every sentence.
+
+        The values are added in bag of words order, so the sums match a Python loop over each sentence.
+
+        Args:
+            term_values (numpy.ndarray): One value per term, ordered like self.terms. Booleans count terms.
+
+        Returns:
+            numpy.ndarray: One float64 sum per sentence.
+        """
+        return numpy.bincount(self.rows, weights=numpy.asarray(term_values, dtype=numpy.float64)[self.indices],
+                              minlength=self.number_of_sentences)
+
+    def term_mask(self, predicate):
+        """
+        Returns a boolean array marking the terms for which predicate(term) is true.
+        """
+        return numpy.fromiter((predicate(term) for term in self.terms), dtype=bool, count=len(self.terms))
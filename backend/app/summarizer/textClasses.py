@@ -1,42 +1,154 @@
+import sys
+
+import numpy
+
+
+class DocumentModel:
+    """
+    Struct-of-arrays storage of the words of every sentence of a document.
+
+    Every distinct lemma is stored once, as an interned string in vocabulary, and sentences refer to
+    lemmas by id. The lemmas of sentence i are token_ids[token_offsets[i]:token_offsets[i + 1]] and its
+    distinct lemmas, in order of first occurrence, are bag_ids[bag_offsets[i]:bag_offsets[i + 1]].
+    Sentence objects built with Sentence.from_model are thin views over these arrays.
+    """
+
+    def __init__(self):
+        self.vocabulary = []
+        self.lemma_ids = {}
+        self._token_ids = []
+        self._token_offsets = [0]
+        self._bag_ids = []
+        self._bag_offsets = [0]
+        self.token_ids = self.token_offsets = self.bag_ids = self.bag_offsets = None
+
+    def lemma_id(self, lemma):
+        """
+        Returns the id of a lemma, adding it to the vocabulary if it is new.
+        """
+        lemma_id = self.lemma_ids.get(lemma)
+        if lemma_id is None:
+            lemma_id = len(self.vocabulary)
+            lemma = sys.intern(lemma)
+            self.vocabulary.append(lemma)
+            self.lemma_ids[lemma] = lemma_id
+        return lemma_id
+
+    def add_sentence(self, lemma_ids, bag_ids=None):
+        """
+        Appends the lemma ids of a sentence.
+
+        Args:
+            lemma_ids (list): The ids of every lemma of the sentence, in order.
+            bag_ids (list, optional): The ids of its bag of words. Defaults to the distinct lemma ids.
+
+        Returns:
+            int: The index of the sentence in the model.
+        """
+        self._token_ids.extend(lemma_ids)
+        self._token_offsets.append(len(self._token_ids))
+        self._bag_ids.extend(dict.fromkeys(lemma_ids) if bag_ids is None else bag_ids)
+        self._bag_offsets.append(len(self._bag_ids))
+        return len(self._token_offsets) - 2
+
+    def freeze(self):
+        """
+        Converts the sentence lists into compact integer arrays once every sentence has been added.
+        """
+        self.token_ids = numpy.array(self._token_ids, dtype=numpy.int32)
+        self.token_offsets = numpy.array(self._token_offsets, dtype=numpy.int64)
+        self.bag_ids = numpy.array(self._bag_ids, dtype=numpy.int32)
+        self.bag_offsets = numpy.array(self._bag_offsets, dtype=numpy.int64)
+        self._token_ids = self._token_offsets = self._bag_ids = self._bag_offsets = None
+        return self
+
+    @property
+    def nbytes(self):
+        return self.token_ids.nbytes + self.token_offsets.nbytes + self.bag_ids.nbytes + self.bag_offsets.nbytes
+
+    def sentence_token_ids(self, i):
+        return self.token_ids[self.token_offsets[i]:self.token_offsets[i + 1]]
+
+    def sentence_bag_ids(self, i):
+        return self.bag_ids[self.bag_offsets[i]:self.bag_offsets[i + 1]]
+
+    def lemmas(self, ids):
+        vocabulary = self.vocabulary
+        return [vocabulary[i] for i in ids.tolist()]
+
+
 class Word:
+    __slots__ = ('stem', 'abs_frequency', 'part_of_speech', 'synonym_list', '_term_weight')
+
     def __init__(self, stem, part_of_speech, synonym_list):
         self.stem = stem
         self.abs_frequency = 1
         self.part_of_speech = part_of_speech
         self.synonym_list = synonym_list
-        self.__term_weight = None
+        self._term_weight = None
 
     @property
     def term_weight(self):
-        return self.__term_weight if self.__term_weight else 0
+        return self._term_weight if self._term_weight else 0
 
     @term_weight.setter
     def term_weight(self, val):
-        self.__term_weight = val
+        self._term_weight = val
 
     def increment_abs_frequency(self):
         self.abs_frequency += 1
 
 
 class Sentence:
+    __slots__ = ('original', 'position', '_rank', '_bag_of_words', '_stemmed_bag_of_words', 'ending_char',
+                 'model', 'index')
+
     def __init__(self, original, position, bag_of_words, stemmed_bag_of_words, ending_char):
         self.original = original
         self.position = position
         self.rank = 0
-        self.bag_of_words = bag_of_words
-        self.stemmed_bag_of_words = stemmed_bag_of_words
+        self._bag_of_words = bag_of_words
+        self._stemmed_bag_of_words = stemmed_bag_of_words
         self.ending_char = ending_char
+        self.model = None
+        self.index = None
+
+    @classmethod
+    def from_model(cls, model, index, original, position):
+        """
+        Creates a sentence whose bags of words are read from a DocumentModel instead of stored lists.
+        """
+        sentence = cls(original, position, None, None, original[-1])
+        sentence.model = model
+        sentence.index = index
+        return sentence
+
+    @property
+    def bag_of_words(self):
+        # The distinct lemmas of the sentence
+        if self.model is not None:
+            return self.model.lemmas(self.model.sentence_bag_ids(self.index))
+        return self._bag_of_words
+
+    @property
+    def stemmed_bag_of_words(self):
+        # Every lemma of the sentence, in order
+        if self.model is not None:
+            return self.model.lemmas(self.model.sentence_token_ids(self.index))
+        return self._stemmed_bag_of_words
 
     @property
     def rank(self):
-        return self.__rank if self.__rank else 0
+        return self._rank if self._rank else 0
 
     @rank.setter
     def rank(self, val):
-        self.__rank = val
+        self._rank = val
 
 
 class Title:
+    __slots__ = ('original', 'bag_of_words')
+
     def __init__(self, original, bag_of_words):
         self.original = original
         self.bag_of_words = bag_of_words
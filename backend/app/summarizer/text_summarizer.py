@@ -2,79 +2,261 @@ import os
 
 from rouge import Rouge
 
-from backend.app.summarizer.clustering import TextClusterer
-from backend.app.summarizer.feature_extraction import FeatureExtractor
-from backend.app.summarizer.fuzzy_logic import FuzzyLogicSummarizer
-from backend.app.summarizer.preprocessing import Preprocessor
-from backend.app.summarizer.utils.helpers import resource_loader, mem_funcs, output_funcs
+from app.summarizer.clustering import TextClusterer
+from app.summarizer.feature_extraction import FeatureExtractor, PHRASE_FILES
+from app.summarizer.fuzzy_logic import FuzzyLogicSummarizer
+from app.summarizer.pipeline import get_pipeline
+from app.summarizer.preprocessing import Preprocessor, prepare_text
+from app.summarizer.utils.helpers import mem_funcs, output_funcs
+
+
+class DocumentAnalysis:
+    """
+    The results of every stage that does not depend on the compression rate.
+
+    Reusing an analysis, e.g. when a text is summarized again at another percentage, leaves only the
+    clustering and the selection of the ranked sentences to be run.
+    """
+
+    def __init__(self, preprocessed_text, feature_values, similarities):
+        self.preprocessed_text = preprocessed_text  # PreprocessedText as returned by the Preprocessor
+        self.feature_values = feature_values
+        self.similarities = similarities  # SimilarityMatrix of the sentences
+
+    @property
+    def nbytes(self):
+        return self.similarities.nbytes if self.similarities is not None else 0
 
 
 class TextSummarizer:
-    def __init__(self, text, compression_rate, num_threads):
+    def __init__(self, text, compression_rate, executor=None, pipeline=None, seed=None, clustering_mode='medoids',
+                 defuzzifier='sampled', analysis=None, section_chars=None, section_workers=1, progress=None):
         self.clusters = None
         self.preprocessed_text = None
+        self.similarities = None
         self.text = text
         self.compression_rate = compression_rate
-        self.num_threads = num_threads
-        self.resources = resource_loader()
-        self.preprocessor = Preprocessor()
+        self.executor = executor  # Runs the blocks of the similarity matrix, serial when None
+        self.seed = seed  # Makes the clustering, and therefore the summary, reproducible
+        self.clustering_mode = clustering_mode
+        self.defuzzifier = defuzzifier
+        # Texts longer than section_chars are summarized section by section, see HierarchicalSummarizer
+        self.section_chars = section_chars
+        self.section_workers = section_workers
+        self.progress = progress
+        # The spaCy model and resources are loaded once per process and shared read-only
+        self.pipeline = pipeline if pipeline is not None else get_pipeline()
+        self.resources = self.pipeline.resources
+        self.preprocessor = Preprocessor(self.pipeline.nlp, self.pipeline.phrase_matcher(PHRASE_FILES),
+                                         self.pipeline.synonyms)
         self.feature_values = None
         self.summary = ""
+        if analysis is not None:
+            self.preprocessed_text = analysis.preprocessed_text
+            self.feature_values = analysis.feature_values
+            self.similarities = analysis.similarities
+
+    @property
+    def analysis(self):
+        """
+        The rate independent results of this summarizer, available once it has summarized its text.
+        """
+        if self.similarities is None:
+            return None
+        return DocumentAnalysis(self.preprocessed_text, self.feature_values, self.similarities)
 
     def preprocess_text(self):
         self.preprocessed_text = self.preprocessor.pre_process_text(self.text)
 
     def extract_features(self):
-        title, sentences, words = self.preprocessed_text
-        feature_extractor = FeatureExtractor(title, sentences, words, self.resources)
+        preprocessed = self.preprocessed_text
+        feature_extractor = FeatureExtractor(preprocessed.title, preprocessed.sentences, preprocessed.words,
+                                             self.resources, preprocessed.index, preprocessed.phrases)
         self.feature_values = feature_extractor.features
 
     def perform_clustering(self):
-        title, sentences, words = self.preprocessed_text
-        text_clusterer = TextClusterer(sentences, words, self.compression_rate, self.num_threads)
+        sentences, words = self.preprocessed_text.sentences, self.preprocessed_text.words
+        text_clusterer = TextClusterer(sentences, words, self.compression_rate, self.executor,
+                                       clustering_mode=self.clustering_mode, seed=self.seed,
+                                       similarities=self.similarities,
+                                       vocabulary=self.preprocessed_text.vocabulary)
         text_clusterer.perform_clustering()
         self.clusters = text_clusterer.get_clusters()
+        self.similarities = text_clusterer.similarities
 
     def generate_summary(self):
         fuzzy_summarizer = FuzzyLogicSummarizer(
-            self.preprocessed_text[1],
+            self.preprocessed_text.sentences,
             self.feature_values,
             self.clusters,
             mem_funcs,
-            output_funcs
+            output_funcs,
+            self.defuzzifier
         )
         fuzzy_summarizer.set_fuzzy_ranks()
         fuzzy_summarizer.summarize()
         # Convert each Sentence object in the summary to its text representation
         self.summary = [sentence.original for sentence in fuzzy_summarizer.summary]
 
-    def summarize(self):
-        self.preprocess_text()
-        self.extract_features()
+    def summarize(self, rates=None):
+        """
+        Summarizes the text at the compression rate of the summarizer, or at each of several rates.
+
+        Args:
+            rates (list, optional): Compression rates as percentages. When given, the text is parsed,
+                featurized, compared and ranked once, and only the clustering and the selection run per rate.
+
+        Returns:
+            str or dict: The summary, or a dictionary mapping every rate to its summary.
+        """
+        if self.preprocessed_text is None and self.section_chars and len(self.text) > self.section_chars:
+            return self.summarize_sections(rates)
+        if self.preprocessed_text is None:
+            self.preprocess_text()
+        if rates is not None:
+            return self.summarize_rates(rates)
+        return self.summarize_preprocessed()
+
+    def summarize_sections(self, rates=None):
+        """
+        Summarizes a long text hierarchically, keeping only a few sections in memory at a time.
+
+        Args:
+            rates (list, optional): Compression rates as percentages, each summarized separately.
+
+        Returns:
+            str or dict: The summary, or a dictionary mapping every rate to its summary.
+        """
+        from app.summarizer.hierarchical import HierarchicalSummarizer
+
+        options = {'executor': self.executor, 'pipeline': self.pipeline, 'seed': self.seed,
+                   'clustering_mode': self.clustering_mode, 'defuzzifier': self.defuzzifier}
+
+        def summarize_at(rate):
+            summarizer = HierarchicalSummarizer(rate, self.section_chars, self.section_workers, self.progress,
+                                                **options)
+            return summarizer.summarize(self.text)
+
+        if rates is None:
+            return summarize_at(self.compression_rate)
+        return {rate: summarize_at(rate) for rate in rates}
+
+    def summarize_rates(self, rates):
+        if self.feature_values is None:
+            self.extract_features()
+        sentences, words = self.preprocessed_text.sentences, self.preprocessed_text.words
+        text_clusterer = TextClusterer(sentences, words, self.compression_rate, self.executor,
+                                       clustering_mode=self.clustering_mode, seed=self.seed,
+                                       similarities=self.similarities,
+                                       vocabulary=self.preprocessed_text.vocabulary)
+        clusterings = text_clusterer.perform_clustering_many(rates)
+        self.similarities = text_clusterer.similarities
+
+        fuzzy_summarizer = FuzzyLogicSummarizer(sentences, self.feature_values, None, mem_funcs, output_funcs,
+                                                self.defuzzifier)
+        fuzzy_summarizer.set_fuzzy_ranks()
+        summaries = {}
+        for rate, clusters in zip(rates, clusterings):
+            fuzzy_summarizer.clusters = clusters
+            summaries[rate] = ' '.join(sentence.original for sentence in fuzzy_summarizer.select_sentences())
+        return summaries
+
+    def summarize_preprocessed(self):
+        if self.feature_values is None:
+            self.extract_features()
         self.perform_clustering()
         self.generate_summary()
         # Return the summary as a string joined by spaces
         return ' '.join(self.summary)
 
+    @classmethod
+    def summarize_many(cls, texts, compression_rate, batch_size=64, n_process=1, **kwargs):
+        """
+        Summarizes many documents, streaming them through the shared spaCy pipeline in batches.
+
+        Parsing is done by nlp.pipe; feature extraction, clustering and fuzzy ranking then run per
+        document. A failing document does not stop the others: texts longer than the parser accepts are
+        rejected before parsing, and if a batch fails to parse, its remaining texts are parsed one by one.
+        Texts longer than section_chars are summarized section by section, as summarize does, and are not
+        parsed in the batch.
+
+        Args:
+            texts (list): The texts to summarize.
+            compression_rate (float): The compression rate as a percentage, used for every text.
+            batch_size (int): The number of texts spaCy processes per batch.
+            n_process (int): The number of processes spaCy parses with.
+            **kwargs: Further TextSummarizer arguments, such as executor, pipeline or seed.
+
+        Returns:
+            list: One dictionary per text, in input order, holding either the 'summary' or the 'error'.
+        """
+        pipeline = kwargs['pipeline'] = kwargs.get('pipeline') or get_pipeline()
+        max_length = pipeline.nlp.max_length
+        section_chars = kwargs.get('section_chars')
+        results = [None] * len(texts)
+
+        def attempt(summarize, *args):
+            try:
+                return {'summary': summarize(*args), 'error': None}
+            except Exception as e:
+                return {'summary': None, 'error': str(e)}
+
+        def summarize_text(text):
+            return cls(text, compression_rate, **kwargs).summarize()
+
+        def summarize_doc(text, doc):
+            summarizer = cls(text, compression_rate, **kwargs)
+            summarizer.preprocessed_text = summarizer.preprocessor.pre_process_doc(doc)
+            return summarizer.summarize_preprocessed()
+
+        batched, sectioned = [], []
+        for i, text in enumerate(texts):
+            if not isinstance(text, str) or not text.strip():
+                results[i] = {'summary': None, 'error': "No text provided"}
+            elif section_chars and len(text) > section_chars:
+                sectioned.append(i)
+            elif len(text.lstrip('\n')) > max_length:
+                results[i] = {'summary': None,
+                              'error': f"The text is longer than the {max_length} characters that can be parsed"}
+            else:
+                batched.append(i)
+
+        docs = pipeline.nlp.pipe((prepare_text(texts[i]) for i in batched), batch_size=batch_size,
+                                 n_process=n_process)
+        for position, i in enumerate(batched):
+            try:
+                doc = next(docs)
+            except Exception:
+                # The pipe cannot resume after an error, so the rest is parsed text by text
+                for j in batched[position:]:
+                    results[j] = attempt(summarize_text, texts[j])
+                break
+            results[i] = attempt(summarize_doc, texts[i], doc)
+
+        for i in sectioned:
+            results[i] = attempt(summarize_text, texts[i])
+        return results
+
 
-# Example usage
-# Correct paths to resources
-current_dir = os.path.dirname(__file__)
-input_text_path = os.path.join(current_dir, 'resources', 'input-text.txt')
-reference_text_path = os.path.join(current_dir, 'resources', 'reference-text.txt')
+if __name__ == '__main__':
+    # Example usage
+    # Correct paths to resources
+    current_dir = os.path.dirname(__file__)
+    input_text_path = os.path.join(current_dir, 'resources', 'input-text.txt')
+    reference_text_path = os.path.join(current_dir, 'resources', 'reference-text.txt')
 
-# Read the files
-with open(input_text_path, 'r', encoding='utf-8') as file:
-    test_text = file.read()
+    # Read the files
+    with open(input_text_path, 'r', encoding='utf-8') as file:
+        test_text = file.read()
 
-summarized_text = TextSummarizer(test_text, 74, 8)  # Assuming TextSummarizer is properly defined
-summary_text = summarized_text.summarize()
-print("Summary: ", summary_text)
+    summarized_text = TextSummarizer(test_text, 74)  # Assuming TextSummarizer is properly defined
+    summary_text = summarized_text.summarize()
+    print("Summary: ", summary_text)
 
-# Calculate ROUGE scores
-with open(reference_text_path, 'r', encoding='utf-8') as file:
-    reference_text = file.read()
+    # Calculate ROUGE scores
+    with open(reference_text_path, 'r', encoding='utf-8') as file:
+        reference_text = file.read()
 
-rouge = Rouge()
-scores = rouge.get_scores(summary_text, reference_text)
-print(scores)
+    rouge = Rouge()
+    scores = rouge.get_scores(summary_text, reference_text)
+    print(scores)
@@ -0,0 +1,168 @@
+import functools
+
+import numpy
+from nltk.stem.porter import PorterStemmer
+
+from app.summarizer.textClasses import DocumentModel
+
+_stemmer = PorterStemmer()
+
+
+@functools.lru_cache(maxsize=65536)
+def stem(word):
+    """
+    Returns the Porter stem of a word, memoized for the whole process.
+
+    Documents share most of their words, so after warm-up nearly every lookup is a cache hit.
+
+    Args:
+        word (str): The word to stem.
+
+    Returns:
+        str: The stem.
+    """
+    return _stemmer.stem(word)
+
+
+class DocumentVocabulary:
+    """
+    Maps every lemma of a document and its synonyms to canonical feature ids, once per document.
+
+    A lemma stands for the set of stems of itself and of its synonyms. Two sentences are compared on
+    how often each of those stems occurs among their lemmas, so the vocabulary also records which
+    feature, if any, every lemma spells when it occurs as a token. Lemma ids are those of the
+    DocumentModel, which the term index used by the features shares.
+    """
+
+    def __init__(self, model, words, stem_function=stem):
+        self.model = model
+        feature_ids = {}
+        indptr = [0]
+        indices = []
+        for lemma in model.vocabulary:
+            synonyms = words[lemma].synonym_list if lemma in words else ()
+            features = {stem_function(synonym) for synonym in synonyms}
+            features.add(stem_function(lemma))
+            indices.extend(sorted(feature_ids.setdefault(feature, len(feature_ids)) for feature in features))
+            indptr.append(len(indices))
+        self.features = list(feature_ids)
+        # The features of every lemma in compressed sparse row form
+        self.lemma_feature_indptr = numpy.array(indptr, dtype=numpy.int64)
+        self.lemma_feature_indices = numpy.array(indices, dtype=numpy.int64)
+        # The feature a lemma matches when it occurs in a sentence, or -1
+        self.token_features = numpy.array([feature_ids.get(lemma, -1) for lemma in model.vocabulary],
+                                          dtype=numpy.int64)
+
+    @classmethod
+    def from_sentences(cls, sentences, words, stem_function=stem):
+        """
+        Builds the vocabulary of sentences that do not come from a DocumentModel.
+        """
+        sentence = sentences[0] if sentences else None
+        if sentence is not None and sentence.model is not None:
+            return cls(sentence.model, words, stem_function)
+        model = DocumentModel()
+        for sentence in sentences:
+            model.add_sentence([model.lemma_id(word) for word in sentence.stemmed_bag_of_words],
+                               [model.lemma_id(word) for word in sentence.bag_of_words])
+        return cls(model.freeze(), words, stem_function)
+
+    def term_matrices(self):
+        """
+        Builds the lemma weights and the lemma membership of the sentences as a sparse TermMatrix.
+
+        Returns:
+            TermMatrix: For every sentence and lemma, how many tokens of the sentence spell one of the
+            lemma's features, and whether the lemma is in the sentence's bag of words. Lemmas that never
+            receive a weight are dropped.
+        """
+        model = self.model
+        number_of_sentences = len(model.token_offsets) - 1
+        number_of_lemmas = len(model.vocabulary)
+
+        # Every token spelling a feature adds one to each lemma having that feature
+        token_rows = numpy.repeat(numpy.arange(number_of_sentences), numpy.diff(model.token_offsets))
+        token_features = self.token_features[model.token_ids]
+        matching = token_features >= 0
+        token_rows, token_features = token_rows[matching], token_features[matching]
+
+        feature_lemmas = numpy.repeat(numpy.arange(number_of_lemmas), numpy.diff(self.lemma_feature_indptr))
+        order = numpy.argsort(self.lemma_feature_indices, kind='stable')
+        feature_indptr = numpy.zeros(len(self.features) + 1, dtype=numpy.int64)
+        numpy.cumsum(numpy.bincount(self.lemma_feature_indices, minlength=len(self.features)),
+                     out=feature_indptr[1:])
+        lemmas_by_feature = feature_lemmas[order]
+
+        starts, ends = feature_indptr[token_features], feature_indptr[token_features + 1]
+        repeats = ends - starts
+        rows = numpy.repeat(token_rows, repeats)
+        offsets = numpy.arange(repeats.sum()) - numpy.repeat(numpy.cumsum(repeats) - repeats, repeats)
+        columns = lemmas_by_feature[numpy.repeat(starts, repeats) + offsets]
+
+        # Only lemmas receiving a weight get a column
+        used, columns = numpy.unique(columns, return_inverse=True)
+        width = len(used)
+        used_columns = numpy.full(number_of_lemmas, -1, dtype=numpy.int64)
+        used_columns[used] = numpy.arange(width)
+        bag_rows = numpy.repeat(numpy.arange(number_of_sentences), numpy.diff(model.bag_offsets))
+        bag_columns = used_columns[model.bag_ids]
+        member = bag_columns >= 0
+        bag_rows, bag_columns = bag_rows[member], bag_columns[member]
+
+        # One entry per sentence and lemma having a weight or a membership, in row-major order;
+        # counts are integers, so float32 weights are exact
+        stride = max(width, 1)
+        keys, inverse = numpy.unique(numpy.concatenate((rows * stride + columns, bag_rows * stride + bag_columns)),
+                                     return_inverse=True)
+        weights = numpy.bincount(inverse[:len(rows)], minlength=len(keys)).astype(numpy.float32)
+        membership = numpy.zeros(len(keys), dtype=numpy.float32)
+        membership[inverse[len(rows):]] = 1
+        indptr = numpy.zeros(number_of_sentences + 1, dtype=numpy.int64)
+        numpy.cumsum(numpy.bincount(keys // stride, minlength=number_of_sentences), out=indptr[1:])
+        return TermMatrix(indptr, keys % stride, weights, membership, width)
+
+
+class TermMatrix:
+    """
+    The lemma weights and lemma membership of the sentences in compressed sparse row form.
+
+    A sentence holds a few dozen of the document's lemmas, so only its entries are stored, and dense
+    blocks of rows are built on demand for the matrix products of the similarity kernel.
+    """
+
+    def __init__(self, indptr, indices, weights, membership, width):
+        self.indptr = indptr  # Row i holds the entries indptr[i]:indptr[i + 1]
+        self.indices = indices  # The lemma column of every entry
+        self.weights = weights  # float32 weight of every entry
+        self.membership = membership  # float32, 1 where the lemma is in the sentence's bag of words
+        self.width = width  # The number of lemma columns
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    @property
+    def nbytes(self):
+        return self.indptr.nbytes + self.indices.nbytes + self.weights.nbytes + self.membership.nbytes
+
+    def dense_rows(self, start, end):
+        """
+        Returns the dense weights and membership of the sentences start:end.
+
+        Returns:
+            tuple: Two float32 arrays of shape (end - start, width).
+        """
+        weights = numpy.zeros((end - start, self.width), dtype=numpy.float32)
+        membership = numpy.zeros((end - start, self.width), dtype=numpy.float32)
+        first, last = self.indptr[start], self.indptr[end]
+        rows = numpy.repeat(numpy.arange(end - start), numpy.diff(self.indptr[start:end + 1]))
+        weights[rows, self.indices[first:last]] = self.weights[first:last]
+        membership[rows, self.indices[first:last]] = self.membership[first:last]
+        return weights, membership
+
+    def squared_inside_sums(self):
+        """
+        Returns, for every sentence, the sum of the squared weights of the lemmas in its bag of words.
+        """
+        rows = numpy.repeat(numpy.arange(len(self)), numpy.diff(self.indptr))
+        inside = self.weights * self.membership
+        return numpy.bincount(rows, weights=inside ** 2, minlength=len(self)).astype(numpy.float32)
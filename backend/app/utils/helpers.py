@@ -1,5 +1,7 @@
 import os
 import random
+import threading
+from concurrent.futures import ProcessPoolExecutor
 
 import fitz  # PyMuPDF
 from docx import Document
@@ -46,18 +48,81 @@ def convert_doc_to_docx(doc_path):
     return doc_path_new
 
 
-def read_text_from_file(file_path):
+# Separates the pages of an extracted PDF; the section splitter of the summarizer prefers to cut there
+PAGE_BREAK = '\f'
+
+_pdf_pools = {}
+_pdf_pools_lock = threading.Lock()
+
+
+def _get_pdf_pool(workers):
+    with _pdf_pools_lock:
+        if workers not in _pdf_pools:
+            _pdf_pools[workers] = ProcessPoolExecutor(max_workers=workers)
+        return _pdf_pools[workers]
+
+
+def open_pdf(source):
+    """
+    Opens a PDF from a path or from its bytes.
+    """
+    return fitz.open(source) if isinstance(source, str) else fitz.open(stream=source, filetype='pdf')
+
+
+def _extract_page_range(source, start, end):
+    # Runs in a worker process, which opens its own copy of the document
+    with open_pdf(source) as doc:
+        return [doc[number].get_text() for number in range(start, end)]
+
+
+def iter_pdf_pages(source, workers=1, pages_per_task=16):
+    """
+    Yields the text of every page of a PDF, in page order.
+
+    With more than one worker, ranges of pages_per_task pages are extracted by a process pool, each
+    worker opening the document independently. Pages are still yielded in order, as soon as the
+    range holding them is done, so the boundaries between pages are preserved for the caller.
+
+    Args:
+        source (str or bytes): The path of the PDF, or its content. Pass a path when workers > 1, as the
+            content would be sent to every task.
+        workers (int): The number of processes. 1 extracts the pages in the calling thread.
+        pages_per_task (int): The number of pages each task extracts.
+
+    Yields:
+        str: The text of each page.
+    """
+    with open_pdf(source) as doc:
+        page_count = doc.page_count
+        if workers <= 1 or page_count <= pages_per_task:
+            for page in doc:
+                yield page.get_text()
+            return
+
+    pool = _get_pdf_pool(workers)
+    futures = [pool.submit(_extract_page_range, source, start, min(start + pages_per_task, page_count))
+               for start in range(0, page_count, pages_per_task)]
+    try:
+        for future in futures:
+            yield from future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def read_text_from_file(file_path, workers=1):
     """
     Read the text content from a file.
 
     Supported file types:
     - .txt: Read the file directly.
-    - .pdf: Extract the text using the PyMuPDF library.
+    - .pdf: Extract the text using the PyMuPDF library, with a PAGE_BREAK between pages.
     - .doc: Attempt to convert to .docx using the convert_doc_to_docx function, then read the .docx file.
     - .docx: Read the text using the python-docx library.
 
     Args:
         file_path (str): The path to the file.
+        workers (int, optional): The number of processes extracting the pages of a PDF.
 
     Returns:
         str or None: The text content of the file, or None if an error occurs or the file type is unsupported.
@@ -70,8 +135,7 @@ def read_text_from_file(file_path):
             text_content = file.read()
 
     elif ext == '.pdf':
-        with fitz.open(file_path) as doc:
-            text_content = "".join(page.get_text() for page in doc)
+        text_content = PAGE_BREAK.join(iter_pdf_pages(file_path, workers))
 
     elif ext == '.doc':
         # Attempt to convert .doc to .docx for reading; Windows only
@@ -0,0 +1,305 @@
+import io
+import os
+import tempfile
+
+from docx import Document
+from flask import Request, current_app, has_app_context
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from app.utils.helpers import PAGE_BREAK, convert_doc_to_docx, iter_pdf_pages, open_pdf
+
+CHUNK_SIZE = 64 * 1024
+
+
+class IngestionError(Exception):
+    """
+    Raised when the text of an uploaded file cannot be extracted.
+    """
+
+
+class UploadTooLarge(IngestionError, RequestEntityTooLarge):
+    """
+    Raised when an upload exceeds UPLOAD_MAX_BYTES. Flask answers it with 413 if it is not caught.
+    """
+
+
+class TooManyPages(IngestionError):
+    """
+    Raised when a document has more pages than UPLOAD_MAX_PAGES.
+    """
+
+
+class UploadSpool(io.RawIOBase):
+    """
+    Writable and readable buffer holding an upload in memory and spilling it to disk when it grows.
+
+    Up to memory_bytes are kept in a BytesIO; beyond that the content moves to a named temporary file,
+    which PyMuPDF can open by path without reading it into memory. Writing more than max_bytes raises
+    UploadTooLarge at once, so an oversized request is rejected while it is still being received. The
+    temporary file is deleted on close; it is not opened with delete=True since Windows could not
+    open it a second time by path. It is named with the suffix of the upload, e.g. '.doc', for the
+    converters that go by the extension of a path.
+    """
+
+    def __init__(self, max_bytes=None, memory_bytes=1024 * 1024, suffix=''):
+        super().__init__()
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self.suffix = suffix
+        self.size = 0
+        self._file = io.BytesIO()
+        self._spilled = False
+
+    @property
+    def path(self):
+        """
+        The path of the temporary file, or None while the upload is held in memory.
+        """
+        return self._file.name if self._spilled else None
+
+    def readable(self):
+        return True
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def write(self, data):
+        if self.max_bytes is not None and self._file.tell() + len(data) > self.max_bytes:
+            raise UploadTooLarge(f"The upload exceeds {self.max_bytes} bytes")
+        if not self._spilled and self._file.tell() + len(data) > self.memory_bytes:
+            self.spill()
+        written = self._file.write(data)
+        self.size = max(self.size, self._file.tell())
+        return written
+
+    def spill(self):
+        """
+        Moves the content to a temporary file, if it is not on disk already.
+        """
+        if self._spilled:
+            return
+        position = self._file.tell()
+        spilled = tempfile.NamedTemporaryFile(prefix='upload-', suffix=self.suffix, delete=False)
+        spilled.write(self._file.getbuffer())
+        spilled.seek(position)
+        self._file = spilled
+        self._spilled = True
+
+    def read(self, size=-1):
+        return self._file.read(size)
+
+    def readinto(self, buffer):
+        return self._file.readinto(buffer)
+
+    def readline(self, size=-1):
+        return self._file.readline(size)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        return self._file.seek(offset, whence)
+
+    def tell(self):
+        return self._file.tell()
+
+    def flush(self):
+        if not self._file.closed:
+            self._file.flush()
+
+    def getvalue(self):
+        """
+        Returns the content as bytes. Only cheap while the upload is held in memory.
+        """
+        if self._spilled:
+            position = self._file.tell()
+            self._file.seek(0)
+            data = self._file.read()
+            self._file.seek(position)
+            return data
+        return self._file.getvalue()
+
+    def close(self):
+        if not self.closed:
+            self._file.close()
+            if self._spilled:
+                try:
+                    os.remove(self._file.name)
+                except OSError:
+                    pass
+        super().close()
+
+
+def upload_limits():
+    """
+    Returns the configured (max_bytes, memory_bytes, max_pages), or no limits outside an application.
+    """
+    if not has_app_context():
+        return None, 1024 * 1024, None
+    config = current_app.config
+    return config['UPLOAD_MAX_BYTES'], config['UPLOAD_SPOOL_BYTES'], config['UPLOAD_MAX_PAGES']
+
+
+class IngestionRequest(Request):
+    """
+    Request whose uploaded files are streamed into an UploadSpool instead of werkzeug's default buffer.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        max_bytes, memory_bytes, _ = upload_limits()
+        return UploadSpool(max_bytes, memory_bytes, upload_suffix(filename))
+
+
+def upload_suffix(filename):
+    """
+    Returns the lowercase extension of an uploaded file name, with its dot, or '' if it has none.
+    """
+    return os.path.splitext(filename or '')[1].lower()
+
+
+def spool_upload(stream, max_bytes=None, memory_bytes=1024 * 1024, suffix=''):
+    """
+    Returns an upload stream as an UploadSpool, copying it only if it is not one already.
+
+    Args:
+        stream: The readable binary stream of the upload, e.g. FileStorage.stream.
+        max_bytes (int, optional): The maximum size of the upload.
+        memory_bytes (int, optional): The size beyond which the upload is spilled to disk.
+        suffix (str, optional): The suffix of the temporary file, e.g. '.doc'.
+
+    Returns:
+        UploadSpool: The upload, positioned at its start.
+    """
+    if isinstance(stream, UploadSpool):
+        if suffix and stream.path is None:
+            stream.suffix = suffix
+        stream.seek(0)
+        return stream
+    spool = UploadSpool(max_bytes, memory_bytes, suffix)
+    try:
+        for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+            spool.write(chunk)
+    except Exception:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+
+def iter_text_chunks(spool, extension, max_pages=None, workers=1):
+    """
+    Yields the text of an upload incrementally, one page or paragraph at a time.
+
+    Args:
+        spool (UploadSpool): The upload.
+        extension (str): The lowercase file extension without the dot: 'txt', 'pdf', 'doc' or 'docx'.
+        max_pages (int, optional): The maximum number of pages of a PDF.
+        workers (int, optional): The number of processes extracting the pages of a PDF.
+
+    Yields:
+        str: A block of a text file, the text of a PDF page or a paragraph of a Word document.
+
+    Raises:
+        TooManyPages: If the PDF has more than max_pages pages.
+        IngestionError: If the file type is not supported or the file cannot be read.
+    """
+    spool.seek(0)
+    if extension == 'txt':
+        reader = io.TextIOWrapper(spool, encoding='utf-8')
+        try:
+            for block in iter(lambda: reader.read(CHUNK_SIZE), ''):
+                yield block
+        except UnicodeDecodeError as e:
+            raise IngestionError(f"The text file is not valid UTF-8: {e}") from e
+        finally:
+            reader.detach()
+
+    elif extension == 'pdf':
+        # PyMuPDF opens a spilled upload by path and a small one from memory, never through a copy on disk
+        spool.flush()
+        source = spool.path or spool.getvalue()
+        try:
+            doc = open_pdf(source)
+        except Exception as e:
+            raise IngestionError(f"Could not open the PDF: {e}") from e
+        with doc:
+            if max_pages is not None and doc.page_count > max_pages:
+                raise TooManyPages(f"The PDF has {doc.page_count} pages, at most {max_pages} are allowed")
+        if workers > 1 and spool.path is None:
+            # Every extraction task opens the document by path, rather than receiving its bytes
+            spool.spill()
+            spool.flush()
+            source = spool.path
+        yield from iter_pdf_pages(source, workers)
+
+    elif extension == 'docx':
+        try:
+            doc = Document(spool)
+        except Exception as e:
+            raise IngestionError(f"Could not open the Word document: {e}") from e
+        for para in doc.paragraphs:
+            yield para.text
+
+    elif extension == 'doc':
+        # The conversion to .docx needs a file on disk; Windows only
+        spool.spill()
+        spool.flush()
+        try:
+            docx_path = convert_doc_to_docx(spool.path)
+        except Exception as e:
+            raise IngestionError(f"Error converting .doc to .docx: {e}") from e
+        try:
+            for para in Document(docx_path).paragraphs:
+                yield para.text
+        finally:
+            os.remove(docx_path)
+
+    else:
+        raise IngestionError(f"Unsupported file type: {extension}")
+
+
+def read_upload(file, max_bytes=None, memory_bytes=None, max_pages=None, workers=None):
+    """
+    Extracts the text of an uploaded file without saving it to the upload folder.
+
+    The pages of a PDF are separated by a PAGE_BREAK and the paragraphs of a Word document are joined
+    with newlines, like read_text_from_file does for files on disk. Limits default to the application
+    configuration.
+
+    Args:
+        file (FileStorage): The uploaded file.
+        max_bytes (int, optional): The maximum size of the upload.
+        memory_bytes (int, optional): The size beyond which the upload is spilled to disk.
+        max_pages (int, optional): The maximum number of pages of a PDF.
+        workers (int, optional): The number of processes extracting the pages of a PDF.
+
+    Returns:
+        str: The text content of the file.
+
+    Raises:
+        UploadTooLarge: If the upload exceeds max_bytes.
+        TooManyPages: If the PDF has more than max_pages pages.
+        IngestionError: If the file type is not supported or the file cannot be read.
+    """
+    configured_max_bytes, configured_memory_bytes, configured_max_pages = upload_limits()
+    max_bytes = max_bytes if max_bytes is not None else configured_max_bytes
+    memory_bytes = memory_bytes if memory_bytes is not None else configured_memory_bytes
+    max_pages = max_pages if max_pages is not None else configured_max_pages
+    if workers is None:
+        workers = current_app.config['PDF_EXTRACT_WORKERS'] if has_app_context() else 1
+
+    suffix = upload_suffix(file.filename)
+    extension = suffix.lstrip('.')
+    separator = {'pdf': PAGE_BREAK, 'doc': '\n', 'docx': '\n'}.get(extension, '')
+    with spool_upload(file.stream, max_bytes, memory_bytes, suffix) as spool:
+        return separator.join(iter_text_chunks(spool, extension, max_pages, workers))
+
+
+def init_ingestion(app):
+    """
+    Streams the uploads of the application into UploadSpool buffers limited by UPLOAD_MAX_BYTES.
+
+    Args:
+        app (Flask): The application whose request class is replaced.
+    """
+    app.request_class = IngestionRequest
@@ -0,0 +1,96 @@
+import threading
+from contextlib import contextmanager
+
+from flask import g
+from pymongo import monitoring
+
+
+class QueryCounter(monitoring.CommandListener):
+    """
+    Counts the MongoDB commands, including getMore round trips, issued by each thread.
+
+    Registered with pymongo before the first client is created, it sees every command sent by the
+    application, so tests can assert how many round trips a request costs.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    @property
+    def count(self):
+        return getattr(self._local, 'count', 0)
+
+    def started(self, event):
+        self._local.count = self.count + 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+query_counter = QueryCounter()
+_registered = False
+_registered_lock = threading.Lock()
+
+
+def register_query_counter():
+    """
+    Registers the process-wide QueryCounter with pymongo, once. Clients created earlier are not counted.
+    """
+    global _registered
+    with _registered_lock:
+        if not _registered:
+            monitoring.register(query_counter)
+            _registered = True
+
+
+class QueryCount:
+    def __init__(self):
+        self.start = query_counter.count
+
+    @property
+    def count(self):
+        return query_counter.count - self.start
+
+
+@contextmanager
+def count_queries():
+    """
+    Counts the commands the current thread issues inside a with block.
+
+    Example:
+        with count_queries() as queries:
+            client.get('/api/v1/texts-summaries').get_data()
+        assert queries.count <= 2
+
+    Yields:
+        QueryCount: Its count property holds the number of commands issued so far in the block.
+    """
+    yield QueryCount()
+
+
+def init_query_counter(app):
+    """
+    Registers the query counter and, when QUERY_COUNT_HEADER is set, reports the number of commands
+    issued while handling each request in its X-Query-Count header. Must run before the database
+    connection is created.
+
+    Args:
+        app (Flask): The application.
+    """
+    register_query_counter()
+    if not app.config['QUERY_COUNT_HEADER']:
+        return
+
+    @app.before_request
+    def start_counting_queries():
+        g.query_count = QueryCount()
+
+    @app.after_request
+    def report_query_count(response):
+        # Queries of a streamed body run after the headers are sent, so they are not included
+        if 'query_count' in g:
+            response.headers['X-Query-Count'] = str(g.query_count.count)
+        return response
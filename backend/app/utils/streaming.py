@@ -0,0 +1,93 @@
+from bson import ObjectId
+from bson.errors import InvalidId
+from flask import Response, current_app, stream_with_context
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+def parse_page_args(args, accept=None, max_limit=1000):
+    """
+    Reads the cursor pagination and output format of a listing request.
+
+    Args:
+        args (MultiDict): The query parameters: 'cursor', the id of the last item of the previous page,
+            'limit', the page size, and 'format', 'json' or 'ndjson'.
+        accept (MIMEAccept, optional): The Accept header; asking for NDJSON selects it as well.
+        max_limit (int): The largest page size allowed.
+
+    Returns:
+        tuple: The cursor as an ObjectId or None, the limit or None when the listing is not paginated,
+        and whether to answer with NDJSON.
+
+    Raises:
+        ValueError: If the cursor, the limit or the format is invalid.
+    """
+    cursor = args.get('cursor')
+    try:
+        after = ObjectId(cursor) if cursor else None
+    except (InvalidId, TypeError):
+        raise ValueError("Invalid cursor")
+
+    limit = args.get('limit')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValueError("Invalid limit")
+        if not 0 < limit <= max_limit:
+            raise ValueError(f"The limit must be between 1 and {max_limit}")
+    elif after is not None:
+        limit = max_limit
+
+    output_format = args.get('format')
+    if output_format is None and accept is not None and accept.best == NDJSON_MIMETYPE:
+        output_format = 'ndjson'
+    if output_format not in (None, 'json', 'ndjson'):
+        raise ValueError("The format must be 'json' or 'ndjson'")
+    return after, limit, output_format == 'ndjson'
+
+
+def _json_chunks(items, limit=None, ndjson=False):
+    dumps = current_app.json.dumps
+    last_id = None
+    count = 0
+    if ndjson:
+        for item in items:
+            last_id = item['id']
+            count += 1
+            yield dumps(item) + '\n'
+        if limit is not None:
+            yield dumps({'next_cursor': last_id if count == limit else None}) + '\n'
+        return
+
+    yield '{"items": [' if limit is not None else '['
+    separator = ''
+    for item in items:
+        last_id = item['id']
+        count += 1
+        yield separator + dumps(item)
+        separator = ', '
+    yield ']'
+    if limit is not None:
+        yield ', "next_cursor": ' + dumps(last_id if count == limit else None) + '}'
+
+
+def stream_items(items, limit=None, ndjson=False):
+    """
+    Streams a listing as it is read from the database instead of building it in memory.
+
+    Without a limit the body is a JSON array, as the listing endpoints always returned. A paginated
+    listing is an object holding the 'items' and the 'next_cursor' to pass as the cursor of the next
+    page, or null on the last page. NDJSON puts one item per line and, when paginated, a last line
+    holding the next_cursor.
+
+    Args:
+        items (iterable): The dictionaries to send, each with an 'id'.
+        limit (int, optional): The page size, None when the listing is not paginated.
+        ndjson (bool): Whether to send NDJSON instead of JSON.
+
+    Returns:
+        Response: The streamed response.
+    """
+    mimetype = NDJSON_MIMETYPE if ndjson else 'application/json'
+    return Response(stream_with_context(_json_chunks(items, limit, ndjson)), mimetype=mimetype)
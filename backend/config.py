@@ -27,3 +27,55 @@ class Config:
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
     UPLOAD_FOLDER = os.path.join(BASE_DIR, 'uploads')
 
+    # Uploads are read from memory and spilled to a temporary file only beyond UPLOAD_SPOOL_BYTES
+    UPLOAD_MAX_BYTES = int(os.getenv('UPLOAD_MAX_BYTES', 20 * 1024 * 1024))
+    UPLOAD_SPOOL_BYTES = int(os.getenv('UPLOAD_SPOOL_BYTES', 1024 * 1024))
+    UPLOAD_MAX_PAGES = int(os.getenv('UPLOAD_MAX_PAGES', 500))
+    PDF_EXTRACT_WORKERS = int(os.getenv('PDF_EXTRACT_WORKERS', 1))  # Processes extracting the pages of large PDFs
+
+    # NLP pipeline settings, loaded once per worker process
+    SPACY_MODEL = os.getenv('SPACY_MODEL', 'en_core_web_sm')
+    SPACY_EXCLUDE = [name for name in os.getenv('SPACY_EXCLUDE', 'ner').split(',') if name]
+    NLP_WARMUP = os.getenv('NLP_WARMUP', 'true').lower() == 'true'  # Load the model in create_app()
+    # Built with `python -m app.summarizer.synonyms build`; an empty value turns synonym expansion off
+    SYNONYM_INDEX_PATH = os.getenv('SYNONYM_INDEX_PATH',
+                                   os.path.join(BASE_DIR, 'instance', 'wordnet_synonyms.sqlite3'))
+
+    # Parallel execution of the sentence similarity matrix: 'serial', 'thread' or 'process'
+    SIMILARITY_EXECUTOR = os.getenv('SIMILARITY_EXECUTOR', 'thread')
+    SIMILARITY_WORKERS = int(os.getenv('SIMILARITY_WORKERS', os.cpu_count() or 1))
+
+    # Clustering settings; requests may override the seed to get a different but reproducible summary
+    CLUSTERING_MODE = os.getenv('CLUSTERING_MODE', 'medoids')  # 'medoids' or the original 'kmeans'
+    CLUSTERING_SEED = int(os.getenv('CLUSTERING_SEED', 0))
+
+    # Defuzzification of the fuzzy ranks: 'sampled' (original), 'analytic' or 'lut'
+    DEFUZZIFIER = os.getenv('DEFUZZIFIER', 'sampled')
+
+    # Batch summarization: texts per request and how spaCy's nlp.pipe parses them
+    MAX_BATCH_DOCUMENTS = int(os.getenv('MAX_BATCH_DOCUMENTS', 500))
+    BATCH_SIZE = int(os.getenv('BATCH_SIZE', 64))
+    BATCH_N_PROCESS = int(os.getenv('BATCH_N_PROCESS', 1))
+    MAX_SUMMARY_RATES = int(os.getenv('MAX_SUMMARY_RATES', 10))  # Percentages per /summarize/multi request
+
+    # Texts longer than SECTION_CHARS are summarized section by section, SECTION_WORKERS sections at a time
+    SECTION_CHARS = int(os.getenv('SECTION_CHARS', 50000))
+    SECTION_WORKERS = int(os.getenv('SECTION_WORKERS', 2))
+
+    # Background summarization jobs, requested with ?async=true: 'thread' pool or 'inline' for tests
+    JOB_QUEUE_BACKEND = os.getenv('JOB_QUEUE_BACKEND', 'thread')
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+    JOB_QUEUE_MAX_DEPTH = int(os.getenv('JOB_QUEUE_MAX_DEPTH', 32))  # Further jobs are refused with 429
+
+    # Report the number of MongoDB commands of every request in an X-Query-Count header
+    QUERY_COUNT_HEADER = os.getenv('QUERY_COUNT_HEADER', 'false').lower() == 'true'
+
+    # Listings stream their items; clients may page them with ?limit= and ?cursor=
+    MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', 1000))
+    LISTING_BATCH_SIZE = int(os.getenv('LISTING_BATCH_SIZE', 100))  # Texts whose summaries are fetched at once
+
+    # Summary cache: an LRU of this many entries per process in front of the CachedSummary collection
+    SUMMARY_CACHE_SIZE = int(os.getenv('SUMMARY_CACHE_SIZE', 1024))
+    SUMMARY_CACHE_PERSISTENT = os.getenv('SUMMARY_CACHE_PERSISTENT', 'true').lower() == 'true'
+    # Parsed sentences, features and similarity matrices of recent texts, reused for other percentages
+    ANALYSIS_CACHE_SIZE = int(os.getenv('ANALYSIS_CACHE_SIZE', 32))
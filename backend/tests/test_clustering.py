@@ -0,0 +1,57 @@
+import numpy
+import pytest
+
+from app.summarizer.clustering import MEDOID_BLOCK_ROWS, TextClusterer
+from app.summarizer.similarity import SimilarityMatrix
+
+
+def random_similarities(size, seed=0, decimals=None):
+    rng = numpy.random.default_rng(seed)
+    values = rng.random((size, size))
+    values = (values + values.T) / 2
+    if decimals is not None:
+        values = numpy.round(values, decimals)
+    numpy.fill_diagonal(values, 0)
+    return SimilarityMatrix(values)
+
+
+def cluster(similarities, percentage, seed):
+    clusterer = TextClusterer(list(range(len(similarities))), {}, percentage, seed=seed, similarities=similarities)
+    clusterer.k_medoids()
+    return clusterer.get_clusters()
+
+
+@pytest.mark.parametrize('size', [30, MEDOID_BLOCK_ROWS + 44])
+def test_same_seed_gives_same_clusters(size):
+    similarities = random_similarities(size, seed=size)
+    clusters = cluster(similarities, 20, seed=7)
+
+    assert cluster(similarities, 20, seed=7) == clusters
+    assert cluster(random_similarities(size, seed=size), 20, seed=7) == clusters
+    assert sorted(member for members in clusters.values() for member in members) == list(range(size))
+    assert all(medoid in members for medoid, members in clusters.items())
+
+
+def test_seeds_give_different_clusters():
+    similarities = random_similarities(60)
+    clusterings = [cluster(similarities, 20, seed) for seed in range(5)]
+    assert any(clusters != clusterings[0] for clusters in clusterings[1:])
+
+
+def test_medoid_is_most_similar_member():
+    # Ties in the rounded similarities are broken towards the lowest index
+    similarities = random_similarities(MEDOID_BLOCK_ROWS + 44, decimals=1)
+    for medoid, members in cluster(similarities, 5, seed=3).items():
+        totals = similarities.submatrix(members).sum(axis=1, dtype=numpy.float64)
+        assert medoid == members[int(numpy.argmax(totals))]
+
+
+@pytest.mark.parametrize('size', [40, MEDOID_BLOCK_ROWS + 44])
+def test_many_percentages_match_separate_runs(size):
+    similarities = random_similarities(size, seed=1, decimals=2)
+    percentages = [5, 10, 25, 10, 50]
+    clusterer = TextClusterer(list(range(size)), {}, percentages[0], seed=11, similarities=similarities)
+
+    clusterings = clusterer.perform_clustering_many(percentages)
+
+    assert clusterings == [cluster(similarities, percentage, seed=11) for percentage in percentages]
@@ -0,0 +1,89 @@
+import numpy
+import pytest
+
+from app.summarizer.fuzzy_engine import OUTPUT_SETS, get_engine
+from app.summarizer.fuzzy_logic import FuzzyLogicSummarizer
+from app.summarizer.utils.helpers import mem_funcs, output_funcs
+
+# The largest distance of each defuzzifier from the sampled center of gravity; the 0.01 grid of the
+# sampled integration is itself up to 2.5e-3 off for a single faint output set
+TOLERANCES = {'analytic': 2.6e-3, 'lut': 9e-3}
+
+
+@pytest.fixture(scope='module')
+def engine():
+    return get_engine(mem_funcs, output_funcs)
+
+
+@pytest.fixture(scope='module')
+def original():
+    return FuzzyLogicSummarizer([], [], None, mem_funcs, output_funcs)
+
+
+def random_strengths(size, seed=0):
+    """
+    Returns random (I, M, L) strength triples, with blocks where some or all output sets do not fire.
+    """
+    rng = numpy.random.default_rng(seed)
+    strengths = rng.uniform(0, 1, size=(size, 3))
+    block = size // 10
+    strengths[:block, 1:] = 0
+    strengths[block:2 * block, 0] = 0
+    strengths[2 * block:3 * block] = rng.uniform(0, 0.02, size=(block, 3))
+    strengths[3 * block:3 * block + 10] = 0
+    return strengths
+
+
+def defuzzify(engine, strengths, defuzzifier):
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        return engine.defuzzify(strengths, defuzzifier)
+
+
+def test_sampled_matches_center_of_gravity(engine, original):
+    strengths = random_strengths(500)
+    expected = []
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        for triple in strengths:
+            expected.append(original.center_of_gravity(dict(zip(OUTPUT_SETS, triple))))
+    numpy.testing.assert_array_equal(defuzzify(engine, strengths, 'sampled'), expected)
+
+
+def test_sampled_ranks_match_original(engine, original):
+    rng = numpy.random.default_rng(1)
+    values = rng.uniform(0, 1, size=(300, len(engine.features)))
+    # Values on the breakpoints of the membership functions
+    values[:50] = rng.choice([0, 0.25, 0.5, 0.75, 1], size=(50, len(engine.features)))
+    feature_values = [dict(zip(engine.features, row)) for row in values]
+
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        expected = [original.get_fuzzy_rank(sentence) for sentence in feature_values]
+        ranks = engine.rank(engine.feature_matrix(feature_values), 'sampled')
+    numpy.testing.assert_array_equal(ranks, expected)
+
+
+@pytest.mark.parametrize('seed', range(4))
+@pytest.mark.parametrize('defuzzifier', sorted(TOLERANCES))
+def test_defuzzifier_error_is_bounded(engine, defuzzifier, seed):
+    strengths = random_strengths(20000, seed)
+    sampled = defuzzify(engine, strengths, 'sampled')
+    result = defuzzify(engine, strengths, defuzzifier)
+
+    fired = ~numpy.isnan(sampled)
+    assert numpy.abs(result[fired] - sampled[fired]).max() <= TOLERANCES[defuzzifier]
+
+
+@pytest.mark.parametrize('defuzzifier', ['sampled', 'analytic', 'lut'])
+def test_zero_strengths_are_nan(engine, defuzzifier):
+    strengths = random_strengths(1000, seed=3)
+    sampled = defuzzify(engine, strengths, 'sampled')
+    result = defuzzify(engine, strengths, defuzzifier)
+
+    zero = ~strengths.any(axis=1)
+    assert zero.sum() == 10
+    numpy.testing.assert_array_equal(numpy.isnan(result), zero)
+    numpy.testing.assert_array_equal(numpy.isnan(result), numpy.isnan(sampled))
+
+
+def test_unknown_defuzzifier(engine):
+    with pytest.raises(ValueError):
+        engine.defuzzify(numpy.ones((1, 3)), 'median')
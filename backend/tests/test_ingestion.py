@@ -0,0 +1,44 @@
+import io
+import os
+
+import docx
+import pytest
+from werkzeug.datastructures import FileStorage
+
+from app.utils import ingestion
+from app.utils.ingestion import UploadSpool, read_upload
+
+
+@pytest.fixture
+def converted(monkeypatch):
+    """
+    Replaces the Windows-only conversion of .doc files, recording the paths it is given.
+    """
+    paths = []
+
+    def convert_doc_to_docx(doc_path):
+        paths.append(doc_path)
+        document = docx.Document()
+        document.add_paragraph('A converted paragraph.')
+        document.save(doc_path + 'x')
+        return doc_path + 'x'
+
+    monkeypatch.setattr(ingestion, 'convert_doc_to_docx', convert_doc_to_docx)
+    return paths
+
+
+def spooled(data):
+    # An upload as IngestionRequest receives it, before the file name is known to read_upload
+    spool = UploadSpool()
+    spool.write(data)
+    return spool
+
+
+@pytest.mark.parametrize('stream', [io.BytesIO, spooled])
+def test_doc_is_converted_from_a_doc_path(converted, stream):
+    file = FileStorage(stream(b'\xd0\xcf\x11\xe0'), filename='text.DOC')
+
+    assert read_upload(file, max_bytes=1024, memory_bytes=1024, max_pages=1, workers=1) == 'A converted paragraph.'
+    assert len(converted) == 1
+    assert converted[0].endswith('.doc')
+    assert not os.path.exists(converted[0]) and not os.path.exists(converted[0] + 'x')
@@ -0,0 +1,264 @@
+import functools
+import io
+import os
+import threading
+
+import pytest
+
+from app import create_app
+from app.models.models import Summary, Text
+from app.utils.query_counter import count_queries, query_counter
+from config import Config
+
+# A real server publishes its command events to the query counter; without one the tests run on mongomock
+TEST_MONGODB_URI = os.getenv('TEST_MONGODB_URI')
+if not TEST_MONGODB_URI:
+    mongomock = pytest.importorskip('mongomock')
+
+# The collection methods that send one command to the server
+COMMANDS = ('aggregate', 'count_documents', 'delete_many', 'delete_one', 'distinct', 'find', 'find_one',
+            'find_one_and_update', 'insert_many', 'insert_one', 'replace_one', 'update_many', 'update_one')
+
+
+class RoutesConfig(Config):
+    TESTING = True
+    NLP_WARMUP = False
+    SUMMARY_CACHE_PERSISTENT = False
+    JOB_QUEUE_BACKEND = 'inline'
+    LISTING_BATCH_SIZE = 5
+    if TEST_MONGODB_URI:
+        MONGODB_SETTINGS = {'host': TEST_MONGODB_URI}
+    else:
+        MONGODB_SETTINGS = {'host': 'mongodb://localhost', 'db': 'test', 'mongo_client_class': mongomock.MongoClient}
+
+
+@pytest.fixture(scope='module')
+def app():
+    return create_app(RoutesConfig)
+
+
+@pytest.fixture
+def client(app):
+    with app.app_context():
+        Text.drop_collection()
+        Summary.drop_collection()
+        yield app.test_client()
+
+
+@pytest.fixture
+def counted(monkeypatch):
+    """
+    Makes every mongomock collection call report one command to the query counter, as pymongo's command
+    events do for a real server. Calls made by another counted call, e.g. find_one running find, are not
+    counted again.
+    """
+    if TEST_MONGODB_URI:
+        return
+    state = threading.local()
+
+    def counting(method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            if getattr(state, 'active', False):
+                return method(*args, **kwargs)
+            query_counter.started(None)
+            state.active = True
+            try:
+                return method(*args, **kwargs)
+            finally:
+                state.active = False
+        return wrapper
+
+    for name in COMMANDS:
+        monkeypatch.setattr(mongomock.collection.Collection, name,
+                            counting(getattr(mongomock.collection.Collection, name)))
+
+
+def create_text(number_of_summaries):
+    text = Text.create_text(content='A text to summarize. ' * 10, user_uid='user', percentage=30)
+    for i in range(number_of_summaries):
+        summary = Summary.create_summary(content=f'Summary {i}.', percentage=30, words=2, text=text)
+        text.add_summary(summary)
+    return text
+
+
+def commands(client, url):
+    with count_queries() as queries:
+        response = client.get(url)
+        body = response.get_json()
+    assert response.status_code == 200
+    return queries.count, body
+
+
+@pytest.mark.parametrize('url', ['/api/v1/text/summary/{}', '/api/v1/texts/{}/summaries'])
+def test_text_with_summaries_takes_constant_commands(client, counted, url):
+    one = create_text(1)
+    many = create_text(12)
+
+    one_count, one_body = commands(client, url.format(one.id))
+    many_count, many_body = commands(client, url.format(many.id))
+
+    assert len(one_body['summaries']) == 1
+    assert [summary['text'] for summary in many_body['summaries']] == [f'Summary {i}.' for i in range(12)]
+    assert many_count == one_count
+    assert 0 < one_count <= 2
+
+
+def test_texts_summaries_takes_constant_commands_per_batch(client, counted):
+    create_text(1)
+    one_count, body = commands(client, '/api/v1/texts-summaries')
+    assert len(body) == 1
+
+    # Still a single batch of LISTING_BATCH_SIZE texts, each with more summaries
+    for _ in range(RoutesConfig.LISTING_BATCH_SIZE - 1):
+        create_text(8)
+    many_count, body = commands(client, '/api/v1/texts-summaries')
+
+    assert len(body) == RoutesConfig.LISTING_BATCH_SIZE
+    assert sum(len(text['summaries']) for text in body) == 1 + 8 * (RoutesConfig.LISTING_BATCH_SIZE - 1)
+    assert 0 < many_count == one_count
+
+
+@pytest.fixture
+def job_queue(app, monkeypatch):
+    """
+    The inline job queue of the application, whose max_depth is restored after the test.
+    """
+    queue = app.extensions['job_queue']
+    monkeypatch.setattr(queue, 'max_depth', queue.max_depth)
+    return queue
+
+
+def document():
+    path = os.path.join(os.path.dirname(__file__), '..', 'app', 'summarizer', 'resources', 'input-text.txt')
+    with open(path, encoding='utf-8') as file:
+        return file.read()
+
+
+def test_async_summary_is_done(client, job_queue):
+    response = client.post('/api/v1/summarize?async=true', json={'text': document(), 'percentage': 30})
+    assert response.status_code == 202
+    queued = response.get_json()
+
+    job = client.get(f"/api/v1/jobs/{queued['job_id']}").get_json()
+    assert job['status'] == Summary.DONE
+    assert job['text_id'] == queued['id']
+    assert job['summary']['text']
+    assert job['summary']['words'] == len(job['summary']['text'].split())
+
+    text = client.get(f"/api/v1/texts/{queued['id']}/summaries").get_json()
+    assert [summary['id'] for summary in text['summaries']] == [queued['job_id']]
+
+
+def test_full_queue_is_refused(client, job_queue):
+    job_queue.max_depth = 0
+    response = client.post('/api/v1/summarize?async=true', json={'text': document(), 'percentage': 30})
+
+    assert response.status_code == 429
+    assert 'error' in response.get_json()
+    assert Text.objects.count() == 0
+    assert Summary.objects.count() == 0
+
+
+@pytest.mark.parametrize('url', ['/api/v1/summarize?async=true', '/api/v1/upload?async=true'])
+def test_queue_filling_up_leaves_nothing_behind(client, job_queue, monkeypatch, url):
+    # The queue fills up between the check of the route and the submission of the job
+    job_queue.max_depth = 0
+    monkeypatch.setattr(job_queue, 'is_full', lambda: False)
+    if 'upload' in url:
+        response = client.post(url, data={'file': (io.BytesIO(document().encode()), 'text.txt'), 'percentage': '30'})
+    else:
+        response = client.post(url, json={'text': document(), 'percentage': 30})
+
+    assert response.status_code == 429
+    assert Text.objects.count() == 0
+    assert Summary.objects.count() == 0
+
+
+@pytest.mark.parametrize('job_id', ['not-an-id', '0123456789abcdef01234567'])
+def test_unknown_job_is_not_found(client, job_id):
+    response = client.get(f'/api/v1/jobs/{job_id}')
+    assert response.status_code == 404
+    assert response.get_json() == {'error': 'Job not found'}
+
+
+def test_failing_job_is_reported(app, client, job_queue, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("The summarizer failed")
+
+    monkeypatch.setattr(app.extensions['summary_cache'], 'summarize', fail)
+    response = client.post('/api/v1/summarize?async=true', json={'text': document(), 'percentage': 30})
+    assert response.status_code == 202
+
+    job = client.get(f"/api/v1/jobs/{response.get_json()['job_id']}").get_json()
+    assert job['status'] == Summary.FAILED
+    assert job['error'] == "The summarizer failed"
+    assert 'summary' not in job
+
+
+@pytest.mark.parametrize('seed', ['abc', -1, 1.5, True, [1]])
+@pytest.mark.parametrize('url', ['/api/v1/summarize', '/api/v1/summarize/multi', '/api/v1/summarize/batch'])
+def test_invalid_seed_is_refused(client, url, seed):
+    body = {'seed': seed}
+    if url.endswith('batch'):
+        body.update(texts=[document()], percentage=30)
+    elif url.endswith('multi'):
+        body.update(text=document(), percentages=[30])
+    else:
+        body.update(text=document(), percentage=30)
+    response = client.post(url, json=body)
+
+    assert response.status_code == 400
+    assert response.get_json() == {'error': "The seed must be a non-negative integer"}
+    assert Text.objects.count() == 0
+
+
+def test_invalid_seed_is_refused_on_upload_and_summarize_again(client):
+    response = client.post('/api/v1/upload', data={'file': (io.BytesIO(document().encode()), 'text.txt'),
+                                                   'percentage': '30', 'seed': 'abc'})
+    assert response.status_code == 400
+    assert Text.objects.count() == 0
+
+    text = create_text(0)
+    response = client.post(f'/api/v1/summarize-again/{text.id}', json={'percentage': 30, 'seed': 'abc'})
+    assert response.status_code == 400
+    assert Summary.objects.count() == 0
+
+
+def test_too_large_upload_is_refused(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'UPLOAD_MAX_BYTES', 1024)
+    response = client.post('/api/v1/upload', data={'file': (io.BytesIO(document().encode()), 'text.txt'),
+                                                   'percentage': '30'})
+
+    assert response.status_code == 413
+    assert response.get_json() == {'error': "File too large"}
+    assert Text.objects.count() == 0
+
+
+def pdf(*pages):
+    import fitz
+    with fitz.open() as doc:
+        for page_text in pages:
+            doc.new_page().insert_text((72, 72), page_text)
+        return doc.tobytes()
+
+
+@pytest.mark.parametrize('url', ['/api/v1/upload', '/api/v1/upload?async=true'])
+def test_page_breaks_only_reach_the_summarizer(app, client, job_queue, monkeypatch, url):
+    cache = app.extensions['summary_cache']
+    summarized = []
+
+    def summarize(content, percentage, options):
+        summarized.append(content)
+        return 'The first page.'
+
+    monkeypatch.setattr(cache, 'summarize', summarize)
+    response = client.post(url, data={'file': (io.BytesIO(pdf('The first page.', 'The second page.')), 'text.pdf'),
+                                      'percentage': '50'})
+    assert response.status_code in (201, 202)
+
+    assert len(summarized) == 1
+    assert [page.split() for page in summarized[0].split('\f')] == [['The', 'first', 'page.'], ['The', 'second', 'page.']]
+    text = client.get(f"/api/v1/text/summary/{response.get_json()['id']}").get_json()
+    assert '\f' not in text['text']
+    assert text['text'].split() == summarized[0].split()
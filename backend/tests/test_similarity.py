@@ -0,0 +1,55 @@
+import random
+
+import numpy
+import pytest
+
+from app.summarizer.clustering import pairwise_block
+from app.summarizer.executors import fill_symmetric_matrix, get_executor
+from app.summarizer.similarity import TERM_BLOCK_ROWS, SimilarityEngine
+from app.summarizer.textClasses import DocumentModel, Sentence, Word
+
+LEMMAS = ('run running runner runs ran walk walking walked talk talking talks talked summary summaries summarize '
+          'summarized text texts textual sentence sentences word words wording cluster clusters clustering '
+          'similar similarity similarities rank ranking ranked fuzzy logic logical model models modelling '
+          'page pages paging document documents section sections').split()
+
+
+def make_document(number_of_sentences, seed=0):
+    """
+    Builds sentences and words like the Preprocessor does, from random lemmas with random synonyms.
+    """
+    rng = random.Random(seed)
+    words = {lemma: Word(lemma, '', rng.sample(LEMMAS, rng.randint(0, 3))) for lemma in LEMMAS}
+    model = DocumentModel()
+    sentences = []
+    for position in range(number_of_sentences):
+        lemmas = [rng.choice(LEMMAS) for _ in range(rng.randint(1, 8))]
+        index = model.add_sentence([model.lemma_id(lemma) for lemma in lemmas])
+        sentences.append(Sentence.from_model(model, index, ' '.join(lemmas) + '.', position + 1))
+    model.freeze()
+    return sentences, words
+
+
+@pytest.fixture(scope='module', params=[40, TERM_BLOCK_ROWS + 30])
+def document(request):
+    sentences, words = make_document(request.param, seed=request.param)
+    expected = fill_symmetric_matrix(pairwise_block, len(sentences), (sentences, words), dtype=numpy.float32)
+    return sentences, words, expected
+
+
+@pytest.mark.parametrize('mode', ['serial', 'thread', 'process'])
+def test_matches_pairwise_loop(document, mode):
+    sentences, words, expected = document
+    similarities = SimilarityEngine(sentences, words).cosine_similarity_matrix(get_executor(mode, 2))
+
+    assert len(similarities) == len(sentences)
+    numpy.testing.assert_allclose(similarities.values, expected, rtol=0, atol=1e-6)
+    assert numpy.count_nonzero(expected) > 0
+
+
+def test_empty_and_single_sentence():
+    for number_of_sentences in (0, 1):
+        sentences, words = make_document(number_of_sentences)
+        similarities = SimilarityEngine(sentences, words).cosine_similarity_matrix()
+        assert similarities.values.shape == (number_of_sentences, number_of_sentences)
+        assert not similarities.values.any()